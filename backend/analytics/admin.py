@@ -0,0 +1,50 @@
+from django.contrib import admin
+
+from analytics.models import AuthorStats, IngredientUsage
+from core.admin_utils import LargeTableAdmin, PrefixSearchMixin
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Сводки только для чтения: строки ведёт analytics.rollups."""
+
+    ordering = ("-recipes_count",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_averages()
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(
+        description="Среднее время (мин)", ordering="average_cooking_time"
+    )
+    def get_average_cooking_time(self, obj):
+        return round(obj.average_cooking_time, 1)
+
+
+@admin.register(IngredientUsage)
+class IngredientUsageAdmin(PrefixSearchMixin, RollupAdmin):
+    list_display = ("ingredient", "recipes_count", "get_average_cooking_time")
+    list_select_related = ("ingredient",)
+    search_fields = ("ingredient__name",)
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(LargeTableAdmin, RollupAdmin):
+    list_display = (
+        "author",
+        "recipes_count",
+        "get_average_cooking_time",
+        "get_average_ingredients",
+    )
+    list_select_related = ("author",)
+    search_fields = ("author__username",)
+
+    @admin.display(
+        description="Ингредиентов в среднем", ordering="average_ingredients"
+    )
+    def get_average_ingredients(self, obj):
+        return round(obj.average_ingredients, 1)
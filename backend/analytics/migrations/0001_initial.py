@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('kitchen', '0009_soft_delete'),
+        ('users', '0005_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSnapshot',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analytics_snapshot', serialize=False, to='kitchen.recipe', verbose_name='Рецепт')),
+                ('author_id', models.BigIntegerField(verbose_name='Автор')),
+                ('cooking_time', models.PositiveSmallIntegerField(verbose_name='Время приготовления (мин)')),
+                ('ingredient_ids', models.JSONField(default=list, verbose_name='Ингредиенты')),
+            ],
+            options={
+                'verbose_name': 'Учтённый рецепт',
+                'verbose_name_plural': 'Учтённые рецепты',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipes_count', models.IntegerField(default=0, verbose_name='Рецептов')),
+                ('total_cooking_time', models.BigIntegerField(default=0, verbose_name='Суммарное время приготовления (мин)')),
+                ('total_ingredients', models.BigIntegerField(default=0, verbose_name='Всего ингредиентов в рецептах')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+                'indexes': [models.Index(fields=['-recipes_count'], name='author_stats_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientUsage',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='kitchen.ingredient', verbose_name='Ингредиент')),
+                ('recipes_count', models.IntegerField(default=0, verbose_name='Рецептов')),
+                ('total_cooking_time', models.BigIntegerField(default=0, verbose_name='Суммарное время приготовления (мин)')),
+            ],
+            options={
+                'verbose_name': 'Использование ингредиента',
+                'verbose_name_plural': 'Использование ингредиентов',
+                'indexes': [models.Index(fields=['-recipes_count'], name='ingredient_usage_count_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.db import models
+
+from kitchen.models import Ingredient, Recipe
+
+
+def per_recipe(field_name):
+    return models.ExpressionWrapper(
+        models.F(field_name) * 1.0 / models.F("recipes_count"),
+        output_field=models.FloatField(),
+    )
+
+
+class RollupQuerySet(models.QuerySet):
+    def with_averages(self):
+        return self.filter(recipes_count__gt=0).annotate(
+            average_cooking_time=per_recipe("total_cooking_time")
+        )
+
+
+class AuthorStatsQuerySet(RollupQuerySet):
+    def with_averages(self):
+        return (
+            super()
+            .with_averages()
+            .annotate(average_ingredients=per_recipe("total_ingredients"))
+        )
+
+
+class IngredientUsage(models.Model):
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="usage",
+        verbose_name="Ингредиент",
+    )
+    recipes_count = models.IntegerField(
+        default=0, verbose_name="Рецептов"
+    )
+    total_cooking_time = models.BigIntegerField(
+        default=0, verbose_name="Суммарное время приготовления (мин)"
+    )
+
+    objects = RollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Использование ингредиента"
+        verbose_name_plural = "Использование ингредиентов"
+        indexes = [
+            models.Index(
+                fields=["-recipes_count"], name="ingredient_usage_count_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient}: {self.recipes_count}"
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats",
+        verbose_name="Автор",
+    )
+    recipes_count = models.IntegerField(
+        default=0, verbose_name="Рецептов"
+    )
+    total_cooking_time = models.BigIntegerField(
+        default=0, verbose_name="Суммарное время приготовления (мин)"
+    )
+    total_ingredients = models.BigIntegerField(
+        default=0, verbose_name="Всего ингредиентов в рецептах"
+    )
+
+    objects = AuthorStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+        indexes = [
+            models.Index(
+                fields=["-recipes_count"], name="author_stats_count_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.author}: {self.recipes_count}"
+
+
+class RecipeSnapshot(models.Model):
+    """Вклад рецепта в сводные таблицы на момент последнего учёта.
+
+    При изменении рецепта из сводок вычитается старый вклад и
+    прибавляется новый, без пересчёта по всем рецептам.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="analytics_snapshot",
+        verbose_name="Рецепт",
+    )
+    author_id = models.BigIntegerField(verbose_name="Автор")
+    cooking_time = models.PositiveSmallIntegerField(
+        verbose_name="Время приготовления (мин)"
+    )
+    ingredient_ids = models.JSONField(default=list, verbose_name="Ингредиенты")
+
+    class Meta:
+        verbose_name = "Учтённый рецепт"
+        verbose_name_plural = "Учтённые рецепты"
+
+    def __str__(self):
+        return str(self.recipe_id)
@@ -0,0 +1,236 @@
+"""Сводные таблицы по рецептам, обновляемые при записи.
+
+Каждый рецепт вносит в сводки вклад: +1 рецепт и его время
+приготовления каждому ингредиенту и автору. Учтённый вклад хранится в
+RecipeSnapshot, так что изменение рецепта меняет только затронутые строки
+сводок, а полный проход по RecipeIngredient нужен лишь команде
+rebuild_analytics. Команду можно запускать под нагрузкой.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from analytics.models import AuthorStats, IngredientUsage, RecipeSnapshot
+from core.constants import ANALYTICS_REBUILD_BATCH_SIZE
+from core.purge import iter_pk_batches
+from kitchen.models import Recipe, RecipeIngredient
+
+ROLLUPS_LOCK_KEY = int(
+    hashlib.sha256(b"analytics.rollups").hexdigest()[:15], 16
+)
+
+
+def lock_rollups(exclusive=False):
+    """Advisory-блокировка сводок до конца текущей транзакции.
+
+    Правки берут её совместно и друг другу не мешают, пересчёт в
+    rebuild() — монопольно. SQLite и так выполняет записи по одной.
+    """
+    if connection.vendor != "postgresql":
+        return
+    function = (
+        "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s)", [ROLLUPS_LOCK_KEY])
+
+
+def apply_contributions(contributions):
+    """Прибавляет к сводкам вклады (знак, автор, время, ингредиенты)."""
+    ingredients = defaultdict(lambda: [0, 0])
+    authors = defaultdict(lambda: [0, 0, 0])
+    for sign, author_id, cooking_time, ingredient_ids in contributions:
+        for ingredient_id in ingredient_ids:
+            ingredients[ingredient_id][0] += sign
+            ingredients[ingredient_id][1] += sign * cooking_time
+        authors[author_id][0] += sign
+        authors[author_id][1] += sign * cooking_time
+        authors[author_id][2] += sign * len(ingredient_ids)
+
+    # Строки с одинаковым приращением обновляются одним запросом.
+    groups = defaultdict(list)
+    for ingredient_id, delta in ingredients.items():
+        if any(delta):
+            groups[tuple(delta)].append(ingredient_id)
+    IngredientUsage.objects.bulk_create(
+        [
+            IngredientUsage(ingredient_id=ingredient_id)
+            for ingredient_id, (count, _) in ingredients.items()
+            if count > 0
+        ],
+        ignore_conflicts=True,
+    )
+    for (count, cooking_time), ingredient_ids in groups.items():
+        IngredientUsage.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).update(
+            recipes_count=F("recipes_count") + count,
+            total_cooking_time=F("total_cooking_time") + cooking_time,
+        )
+
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(author_id=author_id)
+            for author_id, (count, _, _) in authors.items()
+            if count > 0
+        ],
+        ignore_conflicts=True,
+    )
+    for author_id, (count, cooking_time, total) in authors.items():
+        if count or cooking_time or total:
+            AuthorStats.objects.filter(author_id=author_id).update(
+                recipes_count=F("recipes_count") + count,
+                total_cooking_time=F("total_cooking_time") + cooking_time,
+                total_ingredients=F("total_ingredients") + total,
+            )
+
+
+def get_contribution(snapshot, sign):
+    return (
+        sign,
+        snapshot.author_id,
+        snapshot.cooking_time,
+        snapshot.ingredient_ids,
+    )
+
+
+def record_recipe(recipe, ingredient_ids):
+    ingredient_ids = sorted(set(ingredient_ids))
+    with transaction.atomic():
+        lock_rollups()
+        # Блокировка снимка упорядочивает параллельные правки рецепта.
+        snapshot = (
+            RecipeSnapshot.objects.select_for_update()
+            .filter(recipe_id=recipe.id)
+            .first()
+        )
+        contributions = [
+            (1, recipe.author_id, recipe.cooking_time, ingredient_ids)
+        ]
+        if snapshot is not None:
+            contributions.append(get_contribution(snapshot, -1))
+        apply_contributions(contributions)
+        RecipeSnapshot.objects.update_or_create(
+            recipe_id=recipe.id,
+            defaults={
+                "author_id": recipe.author_id,
+                "cooking_time": recipe.cooking_time,
+                "ingredient_ids": ingredient_ids,
+            },
+        )
+
+
+def forget_recipes(recipe_ids):
+    with transaction.atomic():
+        lock_rollups()
+        snapshots = list(
+            RecipeSnapshot.objects.select_for_update().filter(
+                recipe_id__in=recipe_ids
+            )
+        )
+        if not snapshots:
+            return
+        apply_contributions(
+            get_contribution(snapshot, -1) for snapshot in snapshots
+        )
+        RecipeSnapshot.objects.filter(
+            recipe_id__in=[snapshot.recipe_id for snapshot in snapshots]
+        ).delete()
+
+
+def rebuild(batch_size=ANALYTICS_REBUILD_BATCH_SIZE):
+    """Пересобирает снимки и сводки по всем рецептам; возвращает их число.
+
+    Снимки сверяются с рецептами пачками: каждая пачка блокирует строки
+    своих рецептов и снимков, как и record_recipe(), так что правка,
+    пришедшая во время прохода, не затирается старыми данными. Затем
+    сводки пересчитываются по снимкам под монопольной блокировкой
+    lock_rollups(); правки в это время ждут.
+    """
+    processed = 0
+    for recipe_ids in iter_pk_batches(Recipe.objects.all(), batch_size):
+        with transaction.atomic():
+            rows = list(
+                Recipe.objects.select_for_update()
+                .filter(id__in=recipe_ids)
+                .order_by("id")
+                .values_list("id", "author_id", "cooking_time")
+            )
+            list(
+                RecipeSnapshot.objects.select_for_update()
+                .filter(recipe_id__in=recipe_ids)
+                .order_by("recipe_id")
+                .values_list("recipe_id")
+            )
+            recipe_ingredients = defaultdict(list)
+            pairs = (
+                RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+                .values_list("recipe_id", "ingredient_id")
+                .order_by("recipe_id", "ingredient_id")
+            )
+            for recipe_id, ingredient_id in pairs:
+                recipe_ingredients[recipe_id].append(ingredient_id)
+            RecipeSnapshot.objects.bulk_create(
+                [
+                    RecipeSnapshot(
+                        recipe_id=recipe_id,
+                        author_id=author_id,
+                        cooking_time=cooking_time,
+                        ingredient_ids=recipe_ingredients[recipe_id],
+                    )
+                    for recipe_id, author_id, cooking_time in rows
+                ],
+                update_conflicts=True,
+                unique_fields=["recipe"],
+                update_fields=["author_id", "cooking_time", "ingredient_ids"],
+            )
+        processed += len(rows)
+
+    with transaction.atomic():
+        lock_rollups(exclusive=True)
+        RecipeSnapshot.objects.filter(
+            recipe__deleted_at__isnull=False
+        ).delete()
+        ingredients = defaultdict(lambda: [0, 0])
+        authors = defaultdict(lambda: [0, 0, 0])
+        snapshots = RecipeSnapshot.objects.values_list(
+            "author_id", "cooking_time", "ingredient_ids"
+        ).order_by()
+        for author_id, cooking_time, ingredient_ids in snapshots.iterator(
+            chunk_size=batch_size
+        ):
+            for ingredient_id in ingredient_ids:
+                ingredients[ingredient_id][0] += 1
+                ingredients[ingredient_id][1] += cooking_time
+            authors[author_id][0] += 1
+            authors[author_id][1] += cooking_time
+            authors[author_id][2] += len(ingredient_ids)
+
+        IngredientUsage.objects.all().delete()
+        IngredientUsage.objects.bulk_create(
+            [
+                IngredientUsage(
+                    ingredient_id=ingredient_id,
+                    recipes_count=count,
+                    total_cooking_time=cooking_time,
+                )
+                for ingredient_id, (count, cooking_time) in ingredients.items()
+            ],
+            batch_size=batch_size,
+        )
+        AuthorStats.objects.all().delete()
+        AuthorStats.objects.bulk_create(
+            [
+                AuthorStats(
+                    author_id=author_id,
+                    recipes_count=count,
+                    total_cooking_time=cooking_time,
+                    total_ingredients=total,
+                )
+                for author_id, (count, cooking_time, total) in authors.items()
+            ],
+            batch_size=batch_size,
+        )
+    return processed
@@ -0,0 +1,22 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from analytics.rollups import forget_recipes, record_recipe
+from kitchen.models import Recipe
+from kitchen.signals import recipe_saved, recipes_hidden
+
+
+@receiver(recipe_saved)
+def update_rollups(sender, recipe, ingredient_ids, **kwargs):
+    record_recipe(recipe, ingredient_ids)
+
+
+@receiver(recipes_hidden)
+def subtract_hidden_recipes(sender, recipe_ids, **kwargs):
+    forget_recipes(recipe_ids)
+
+
+@receiver(pre_delete, sender=Recipe)
+def subtract_deleted_recipe(sender, instance, **kwargs):
+    # После удаления снимок пропадёт каскадом вместе с рецептом.
+    forget_recipes([instance.id])
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from analytics.models import AuthorStats, IngredientUsage
+from analytics import rollups
+from analytics.rollups import rebuild
+from kitchen.models import Ingredient, Recipe
+from users.models import User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RollupTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.salt, self.sugar, self.flour = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("соль", "сахар", "мука")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def save_recipe(self, ingredients, cooking_time, recipe_id=None):
+        data = {
+            "name": "Рецепт",
+            "text": "Описание",
+            "cooking_time": cooking_time,
+            "image": IMAGE,
+            "ingredients": [
+                {"id": ingredient.id, "amount": 1}
+                for ingredient in ingredients
+            ],
+        }
+        if recipe_id is None:
+            response = self.client.post(
+                reverse("recipes-list"), data, format="json"
+            )
+        else:
+            response = self.client.patch(
+                reverse("recipes-detail", args=[recipe_id]),
+                data,
+                format="json",
+            )
+        return response.data["id"]
+
+    def snapshot(self):
+        return (
+            sorted(
+                IngredientUsage.objects.filter(recipes_count__gt=0)
+                .values_list(
+                    "ingredient_id", "recipes_count", "total_cooking_time"
+                )
+            ),
+            sorted(
+                AuthorStats.objects.filter(recipes_count__gt=0)
+                .values_list(
+                    "author_id",
+                    "recipes_count",
+                    "total_cooking_time",
+                    "total_ingredients",
+                )
+            ),
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.save_recipe([self.salt, self.sugar], 10)
+        second = self.save_recipe([self.salt, self.flour], 30)
+        self.save_recipe([self.sugar, self.flour], 20, recipe_id=first)
+        third = self.save_recipe([self.salt], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse("recipes-detail", args=[second]))
+        Recipe.objects.get(id=third).delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(
+            incremental,
+            (
+                [(self.sugar.id, 1, 20), (self.flour.id, 1, 20)],
+                [(self.author.id, 1, 20, 2)],
+            ),
+        )
+        rebuild(batch_size=1)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_keeps_edits_made_during_the_pass(self):
+        first = self.save_recipe([self.salt], 10)
+        self.save_recipe([self.sugar], 20)
+        iter_pk_batches = rollups.iter_pk_batches
+
+        def edit_after_first_batch(queryset, batch_size):
+            for number, batch in enumerate(
+                iter_pk_batches(queryset, batch_size)
+            ):
+                yield batch
+                if number == 0:
+                    self.save_recipe(
+                        [self.salt, self.flour], 40, recipe_id=first
+                    )
+
+        with patch(
+            "analytics.rollups.iter_pk_batches", edit_after_first_batch
+        ):
+            rebuild(batch_size=1)
+        self.assertEqual(
+            self.snapshot(),
+            (
+                sorted(
+                    [
+                        (self.salt.id, 1, 40),
+                        (self.sugar.id, 1, 20),
+                        (self.flour.id, 1, 40),
+                    ]
+                ),
+                [(self.author.id, 2, 60, 3)],
+            ),
+        )
+
+    def test_api_orders_by_usage(self):
+        self.save_recipe([self.salt, self.sugar], 10)
+        self.save_recipe([self.salt], 30)
+        response = self.client.get(reverse("analytics-ingredients-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [
+            (row["ingredient"]["name"], row["recipes_count"])
+            for row in response.data["results"]
+        ]
+        self.assertEqual(rows, [("соль", 2), ("сахар", 1)])
+        self.assertEqual(response.data["results"][0]["average_cooking_time"], 20)
+
+        response = self.client.get(
+            reverse("analytics-authors-list"),
+            {"ordering": "-average_ingredients"},
+        )
+        self.assertEqual(
+            response.data["results"][0]["average_ingredients"], 1.5
+        )
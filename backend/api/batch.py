@@ -0,0 +1,156 @@
+import asyncio
+import json
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import Resolver404, resolve
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.constants import BATCH_MAX_REQUESTS
+
+API_PREFIX = "/api/"
+SKIPPED_META = ("CONTENT_LENGTH", "CONTENT_TYPE", "wsgi.input")
+
+
+class BatchError(Exception):
+    pass
+
+
+def parse_batch(body):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise BatchError("Тело запроса должно быть JSON.")
+    if not isinstance(payload, dict):
+        raise BatchError("Ожидается объект с полем requests.")
+    items = payload.get("requests")
+    if not isinstance(items, list) or not items:
+        raise BatchError("Поле requests должно быть непустым списком.")
+    if len(items) > BATCH_MAX_REQUESTS:
+        raise BatchError(
+            f"Не больше {BATCH_MAX_REQUESTS} запросов в одном пакете."
+        )
+    paths = []
+    for item in items:
+        path = item.get("path") if isinstance(item, dict) else None
+        if not isinstance(path, str) or not path.startswith(API_PREFIX):
+            raise BatchError(f"Путь должен начинаться с {API_PREFIX}.")
+        if item.get("method", "GET").upper() != "GET":
+            raise BatchError("Поддерживаются только GET-запросы.")
+        paths.append(path)
+    return paths, bool(payload.get("parallel"))
+
+
+def authenticate(request):
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else AnonymousUser()
+
+
+def build_subrequest(request, user, path):
+    url = urlsplit(path)
+    subrequest = HttpRequest()
+    subrequest.method = "GET"
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.META = {
+        key: value
+        for key, value in request.META.items()
+        if key not in SKIPPED_META
+    }
+    subrequest.META.update(
+        REQUEST_METHOD="GET", PATH_INFO=url.path, QUERY_STRING=url.query
+    )
+    subrequest.GET = QueryDict(url.query)
+    subrequest.COOKIES = request.COOKIES
+    subrequest.user = user
+    # Пользователь уже проверен: DRF не будет повторно искать токен.
+    if user.is_authenticated:
+        subrequest._force_auth_user = user
+    return subrequest
+
+
+def run_subrequest(request, user, path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return {"path": path, "status": HTTPStatus.NOT_FOUND, "body": None}
+    if match.func is batch:
+        return {"path": path, "status": HTTPStatus.BAD_REQUEST, "body": None}
+    response = match.func(
+        build_subrequest(request, user, path), *match.args, **match.kwargs
+    )
+    if hasattr(response, "render"):
+        response.render()
+    body = response.content.decode() or None
+    content_type = response.get("Content-Type", "")
+    if body and content_type.startswith("application/json"):
+        body = json.loads(body)
+    return {"path": path, "status": response.status_code, "body": body}
+
+
+def run_in_thread(request, user, path):
+    # Потоки пула sync_to_async живут дольше запроса: соединение с БД
+    # каждого из них закрывается так же, как в конце обычного запроса.
+    close_old_connections()
+    try:
+        return run_subrequest(request, user, path)
+    finally:
+        close_old_connections()
+
+
+def run_sequentially(request, user, paths):
+    return [run_subrequest(request, user, path) for path in paths]
+
+
+@csrf_exempt
+async def batch(request):
+    """Выполняет несколько GET-запросов к API за один HTTP-запрос.
+
+    Подзапросы проходят мимо middleware и используют уже
+    аутентифицированного пользователя. По умолчанию они выполняются
+    последовательно в одном потоке и на одном соединении с БД; с
+    "parallel": true под ASGI независимые подзапросы идут параллельно.
+    nginx направляет /api/batch/ в ASGI-сервис events, под gunicorn
+    запросы выполняются последовательно.
+    """
+    if request.method != "POST":
+        return JsonResponse(
+            {"detail": "Метод не разрешён."},
+            status=HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+    try:
+        paths, parallel = parse_batch(request.body)
+    except BatchError as error:
+        return JsonResponse(
+            {"detail": str(error)}, status=HTTPStatus.BAD_REQUEST
+        )
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Недопустимый токен."}, status=HTTPStatus.UNAUTHORIZED
+        )
+    if parallel and isinstance(request, ASGIRequest):
+        responses = await asyncio.gather(
+            *(
+                sync_to_async(run_in_thread, thread_sensitive=False)(
+                    request, user, path
+                )
+                for path in paths
+            )
+        )
+    else:
+        responses = await sync_to_async(run_sequentially)(
+            request, user, paths
+        )
+    return JsonResponse(
+        {"responses": responses}, json_dumps_params={"ensure_ascii": False}
+    )
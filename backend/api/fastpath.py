@@ -0,0 +1,232 @@
+"""Быстрая сериализация списков только для чтения.
+
+Строки выбираются через .values(), а JSON собирается функциями, которые
+повторяют вывод RecipeReadSerializer, UserSerializer и
+SubscriptionSerializer поле в поле, без создания полей DRF на каждый
+объект. Совпадение вывода проверяется тестами в api/tests.py.
+"""
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from api.serializers import (
+    RecipeReadSerializer,
+    UserSerializer,
+    get_sparse_fields,
+)
+from kitchen.lookups import get_recipe_ingredients
+from kitchen.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+RECIPE_OUTPUT_FIELDS = RecipeReadSerializer.Meta.fields
+RECIPE_COLUMNS = {
+    "author": "author_id",
+    "name": "name",
+    "image": "image",
+    "text": "text",
+    "cooking_time": "cooking_time",
+}
+USER_FIELDS = ("id", "email", "username", "first_name", "last_name", "avatar")
+
+
+def make_url_builder(model, field_name, request):
+    storage = model._meta.get_field(field_name).storage
+
+    def build_url(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is None:
+            return url
+        return request.build_absolute_uri(url)
+
+    return build_url
+
+
+def in_order(rows, ids):
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def serialize_users(user_ids, request):
+    user = request.user
+    queryset = User.objects.filter(id__in=user_ids)
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef("pk"))
+            )
+        )
+        fields = USER_FIELDS + ("is_subscribed",)
+    else:
+        fields = USER_FIELDS
+    avatar_url = make_url_builder(User, "avatar", request)
+    return {
+        row["id"]: {
+            "id": row["id"],
+            "email": row["email"],
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "avatar": avatar_url(row["avatar"]),
+            "is_subscribed": row.get("is_subscribed", False),
+        }
+        for row in queryset.values(*fields).order_by()
+    }
+
+
+def serialize_profile(request):
+    """Профиль текущего пользователя без обращений к БД.
+
+    Пользователь уже загружен аутентификацией, а подписаться на себя
+    нельзя, поэтому is_subscribed всегда False.
+    """
+    user = request.user
+    data = {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "avatar": make_url_builder(User, "avatar", request)(user.avatar.name),
+        "is_subscribed": False,
+    }
+    fields = get_sparse_fields(request, UserSerializer)
+    return {name: data[name] for name in fields}
+
+
+def serialize_recipes(recipe_ids, request, fields=RECIPE_OUTPUT_FIELDS):
+    """Аналог RecipeReadSerializer(many=True) для списка id рецептов.
+
+    Запрашиваются только данные для полей из fields: без ingredients
+    не выполняется запрос к RecipeIngredient, без text колонка не читается.
+    """
+    recipe_ids = list(recipe_ids)
+    user = request.user
+    queryset = Recipe.objects.filter(id__in=recipe_ids)
+    columns = ["id"] + [
+        column
+        for field, column in RECIPE_COLUMNS.items()
+        if field in fields
+    ]
+    if "ingredients" in fields:
+        columns.append("updated_at")
+    flags = {
+        "is_favorited": Favorite,
+        "is_in_shopping_cart": ShoppingCart,
+    }
+    for field, model in flags.items():
+        if field in fields and user.is_authenticated:
+            queryset = queryset.annotate(
+                **{
+                    field: Exists(
+                        model.objects.filter(user=user, recipe=OuterRef("pk"))
+                    )
+                }
+            )
+            columns.append(field)
+    rows = {row["id"]: row for row in queryset.values(*columns).order_by()}
+
+    builders = {
+        "id": itemgetter("id"),
+        "name": itemgetter("name"),
+        "text": itemgetter("text"),
+        "cooking_time": itemgetter("cooking_time"),
+        "is_favorited": lambda row: row.get("is_favorited", False),
+        "is_in_shopping_cart": lambda row: row.get(
+            "is_in_shopping_cart", False
+        ),
+    }
+    if "author" in fields:
+        authors = serialize_users(
+            {row["author_id"] for row in rows.values()}, request
+        )
+        builders["author"] = lambda row: authors[row["author_id"]]
+    if "image" in fields:
+        image_url = make_url_builder(Recipe, "image", request)
+        builders["image"] = lambda row: image_url(row["image"])
+    if "ingredients" in fields:
+        ingredients = get_recipe_ingredients(
+            {row["id"]: row["updated_at"] for row in rows.values()}
+        )
+        builders["ingredients"] = lambda row: ingredients[row["id"]]
+    row_builders = [(field, builders[field]) for field in fields]
+    return [
+        {field: build(row) for field, build in row_builders}
+        for row in in_order(rows, recipe_ids)
+    ]
+
+
+def parse_recipes_limit(request):
+    # Повторяет SubscriptionSerializer.get_recipes: некорректный
+    # или отрицательный лимит означает «без ограничения».
+    limit = request.query_params.get("recipes_limit")
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def serialize_subscriptions(author_ids, request):
+    """Аналог SubscriptionSerializer(many=True) для списка id авторов."""
+    author_ids = list(author_ids)
+    user = request.user
+    queryset = User.objects.filter(id__in=author_ids).annotate(
+        recipes_count=Count(
+            "recipes", filter=Q(recipes__deleted_at__isnull=True)
+        ),
+    )
+    fields = USER_FIELDS + ("recipes_count",)
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef("pk"))
+            )
+        )
+        fields += ("is_subscribed",)
+    rows = {row["id"]: row for row in queryset.values(*fields).order_by()}
+
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    limit = parse_recipes_limit(request)
+    if limit is not None:
+        recipes = recipes.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=Recipe._meta.ordering,
+            )
+        ).filter(position__lte=limit)
+    image_url = make_url_builder(Recipe, "image", request)
+    author_recipes = defaultdict(list)
+    recipe_rows = recipes.values(
+        "id", "author_id", "name", "image", "cooking_time"
+    )
+    for recipe in recipe_rows:
+        author_recipes[recipe["author_id"]].append(
+            {
+                "id": recipe["id"],
+                "name": recipe["name"],
+                "image": image_url(recipe["image"]),
+                "cooking_time": recipe["cooking_time"],
+            }
+        )
+
+    avatar_url = make_url_builder(User, "avatar", request)
+    return [
+        {
+            "email": row["email"],
+            "id": row["id"],
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "is_subscribed": row.get("is_subscribed", False),
+            "recipes": author_recipes[row["id"]],
+            "recipes_count": row["recipes_count"],
+            "avatar": avatar_url(row["avatar"]),
+        }
+        for row in in_order(rows, author_ids)
+    ]
@@ -1,15 +1,47 @@
 import django_filters
-from kitchen.models import Recipe
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Lower
+from rest_framework.filters import BaseFilterBackend
+from kitchen.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import User
+
+USER_SEARCH_FIELDS = ("username", "first_name", "last_name")
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(django_filters.FilterSet):
-    author = django_filters.NumberFilter(field_name="author__id")
+    author = NumberInFilter(field_name="author_id", lookup_expr="in")
     is_favorited = django_filters.CharFilter(method="filter_is_favorited")
     is_in_shopping_cart = django_filters.CharFilter(method="filter_in_cart")
+    ingredients = NumberInFilter(method="filter_ingredients")
+    exclude_ingredients = NumberInFilter(method="filter_exclude_ingredients")
+    cooking_time = django_filters.RangeFilter()
+    pub_date = django_filters.IsoDateTimeFromToRangeFilter()
 
     class Meta:
         model = Recipe
-        fields = ["author", "is_favorited", "is_in_shopping_cart"]
+        fields = [
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "ingredients",
+            "exclude_ingredients",
+            "cooking_time",
+            "pub_date",
+        ]
+
+    def has_filters(self):
+        """Задан ли хоть один фильтр; fields, limit и прочее не считаются."""
+        if not self.is_valid():
+            # Ошибку в ответ 400 превратит DjangoFilterBackend.
+            return True
+        return any(
+            value not in (None, "", [])
+            for value in self.form.cleaned_data.values()
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -17,7 +49,11 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.none()
 
         if value == "1":
-            return queryset.filter(favorited_by__user=user).distinct()
+            return queryset.filter(
+                Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+                )
+            )
 
         return queryset
 
@@ -27,7 +63,73 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.none()
 
         if value == "1":
-            qs = queryset.filter(in_shopping_carts__user=user).distinct()
-            return qs
+            return queryset.filter(
+                Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=OuterRef("pk")
+                    )
+                )
+            )
 
         return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        for ingredient_id in set(value):
+            queryset = queryset.filter(
+                Exists(
+                    RecipeIngredient.objects.filter(
+                        recipe=OuterRef("pk"), ingredient_id=ingredient_id
+                    )
+                )
+            )
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(
+            Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=OuterRef("pk"), ingredient_id__in=value
+                )
+            )
+        )
+
+
+class UserFilter(django_filters.FilterSet):
+    search = django_filters.CharFilter(method="filter_search")
+
+    class Meta:
+        model = User
+        fields = ["search"]
+
+    def filter_search(self, queryset, name, value):
+        # LOWER(поле) LIKE 'префикс%' использует функциональные индексы
+        # из миграции users 0002, в отличие от UPPER(...) у istartswith.
+        prefix = value.strip().lower()
+        if not prefix:
+            return queryset
+        condition = Q()
+        for field in USER_SEARCH_FIELDS:
+            condition |= Q(**{f"{field}_lower__startswith": prefix})
+        return queryset.alias(
+            **{f"{field}_lower": Lower(field) for field in USER_SEARCH_FIELDS}
+        ).filter(condition)
+
+
+class RecipeRankingFilter(BaseFilterBackend):
+    ordering_param = "ordering"
+    rankings = {
+        "popular": "score__popularity",
+        "trending": "score__trending",
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        ranking = self.rankings.get(
+            request.query_params.get(self.ordering_param)
+        )
+        if ranking is None:
+            return queryset
+        # Внутренний JOIN и порядок (рейтинг, id) совпадают с индексом
+        # RecipeScore: база читает его по порядку до LIMIT.
+        return queryset.filter(score__isnull=False).order_by(
+            f"-{ranking}", "-id"
+        )
@@ -1,5 +1,58 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = "limit"
+
+
+class FeedCursorPagination(CursorPagination):
+    """Курсор по ключу (pub_date, id) последнего рецепта страницы.
+
+    Страницу собирает kitchen.feed.get_feed_page по индексам ленты,
+    поэтому листать можно только вперёд.
+    """
+
+    ordering = ("-pub_date", "-id")
+    page_size_query_param = "limit"
+
+    def paginate_feed(self, get_page, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        before = None
+        if cursor is not None and cursor.position:
+            try:
+                pub_date, recipe_id = cursor.position.rsplit(",", 1)
+                before = (datetime.fromisoformat(pub_date), int(recipe_id))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        rows = get_page(page_size + 1, before)
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        if rows:
+            pub_date, recipe_id = rows[-1]
+            self.next_position = f"{pub_date.isoformat()},{recipe_id}"
+        return [recipe_id for _, recipe_id in rows]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position)
+        )
+
+    def get_previous_link(self):
+        return None
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = ("username",)
+    page_size_query_param = "limit"
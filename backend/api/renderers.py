@@ -0,0 +1,31 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer с заранее созданным кодировщиком.
+
+    Вывод совпадает с JSONRenderer байт в байт, но кодировщик не
+    создаётся заново на каждый ответ, а экранирование U+2028/U+2029
+    выполняется только когда эти символы действительно встречаются.
+    """
+
+    encoder = json.JSONEncoder(
+        ensure_ascii=JSONRenderer.ensure_ascii,
+        allow_nan=not JSONRenderer.strict,
+        separators=(",", ":"),
+        default=encoders.JSONEncoder().default,
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = self.encoder.encode(data)
+        if "\u2028" in ret or "\u2029" in ret:
+            ret = ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return ret.encode()
@@ -1,15 +1,65 @@
 from rest_framework import serializers
 from django.contrib.auth import password_validation
 from django.core.validators import MinValueValidator, MaxValueValidator
+from analytics.models import AuthorStats, IngredientUsage
 from users.models import Follow, User
 from api.fields import Base64ImageField
 from kitchen.models import Ingredient, Recipe, RecipeIngredient
+from kitchen.feed import fan_out_recipe
+from kitchen.signals import recipe_saved
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from core.constants import MIN_INGREDIENT_AMOUNT, MAX_INGREDIENT_AMOUNT, MIN_COOKING_TIME, MAX_COOKING_TIME
+from core.constants import PANTRY_DEFAULT_MAX_MISSING, PANTRY_MAX_MISSING
+
+
+def get_sparse_fields(request, serializer_class):
+    """Поля сериализатора, выбранные параметрами ?fields= и ?omit=.
+
+    В ?fields= можно указать имя набора из field_presets, например
+    ?fields=compact. Порядок полей всегда как в Meta.fields, id
+    выводится всегда.
+    """
+    declared = serializer_class.Meta.fields
+    if request is None:
+        return declared
+    params = request.query_params
+    selected = set(declared)
+    if params.get("fields"):
+        selected = {"id"}
+        for name in params["fields"].split(","):
+            name = name.strip()
+            selected.update(serializer_class.field_presets.get(name, (name,)))
+    if params.get("omit"):
+        selected -= {name.strip() for name in params["omit"].split(",")}
+        selected.add("id")
+    return tuple(name for name in declared if name in selected)
+
+
+class SparseFieldsMixin:
+    field_presets = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Вложенные сериализаторы (например, author в рецепте) всегда
+        # выводятся целиком: параметры запроса относятся к верхнему уровню.
+        parent = getattr(self, "parent", None)
+        if isinstance(parent, serializers.ListSerializer):
+            parent = getattr(parent, "parent", None)
+        if parent is not None:
+            return fields
+        selected = get_sparse_fields(
+            self.context.get("request"), type(self)
+        )
+        return {
+            name: field for name, field in fields.items() if name in selected
+        }
 
 
-class UserSerializer(BaseUserSerializer):
+class UserSerializer(SparseFieldsMixin, BaseUserSerializer):
+    field_presets = {
+        "compact": ("id", "username", "first_name", "last_name", "avatar"),
+    }
     avatar = Base64ImageField(required=False, allow_null=True)
     is_subscribed = serializers.SerializerMethodField()
 
@@ -30,6 +80,8 @@ class UserSerializer(BaseUserSerializer):
         user = request.user
         if not user.is_authenticated:
             return False
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         return obj.following.filter(user=user).exists()
 
 
@@ -86,7 +138,18 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    field_presets = {
+        "compact": (
+            "id",
+            "author",
+            "name",
+            "image",
+            "cooking_time",
+            "is_favorited",
+            "is_in_shopping_cart",
+        ),
+    }
     author = UserSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(
         source="recipe_ingredients", many=True, read_only=True
@@ -174,11 +237,17 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 for item in ingredients
             ]
         )
+        recipe_saved.send(
+            sender=Recipe,
+            recipe=recipe,
+            ingredient_ids=[item["ingredient"].id for item in ingredients],
+        )
 
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(ingredients, recipe)
+        fan_out_recipe(recipe)
         return recipe
 
     def update(self, instance, validated_data):
@@ -200,6 +269,23 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return RecipeReadSerializer(instance, context=self.context).data
 
 
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.CharField()
+    max_missing = serializers.IntegerField(
+        min_value=0,
+        max_value=PANTRY_MAX_MISSING,
+        default=PANTRY_DEFAULT_MAX_MISSING,
+    )
+
+    def validate_ingredients(self, value):
+        try:
+            return [int(item) for item in value.split(",") if item.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                "Укажите id ингредиентов через запятую."
+            )
+
+
 class SubscriptionRecipeSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
 
@@ -324,5 +410,32 @@ class FollowCreateSerializer(serializers.ModelSerializer):
 
         return data
 
-    def create(self, validated_data):
-        return Follow.objects.create(**validated_data)
+
+class IngredientUsageSerializer(serializers.ModelSerializer):
+    ingredient = IngredientSerializer(read_only=True)
+    average_cooking_time = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = IngredientUsage
+        fields = ("ingredient", "recipes_count", "average_cooking_time")
+
+
+class AuthorStatsAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("id", "username", "first_name", "last_name")
+
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    author = AuthorStatsAuthorSerializer(read_only=True)
+    average_cooking_time = serializers.FloatField(read_only=True)
+    average_ingredients = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = AuthorStats
+        fields = (
+            "author",
+            "recipes_count",
+            "average_cooking_time",
+            "average_ingredients",
+        )
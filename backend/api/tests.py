@@ -0,0 +1,771 @@
+import os
+import shutil
+import tempfile
+from base64 import b64encode
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.serializers import (
+    IngredientSerializer,
+    RecipeReadSerializer,
+    SubscriptionSerializer,
+)
+from kitchen.models import (
+    Change,
+    FanOutOnReadAuthor,
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from kitchen.deletion import soft_delete_users
+from kitchen.feed import get_feed_page
+from kitchen.rankings import refresh_scores
+from kitchen.search import recipe_index
+from users.models import Follow, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FeedTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def create_recipe(self, name):
+        response = self.author_client.post(
+            reverse("recipes-list"),
+            {
+                "name": name,
+                "text": "Описание",
+                "cooking_time": 10,
+                "image": IMAGE,
+                "ingredients": [{"id": self.ingredient.id, "amount": 5}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def get_feed_ids(self):
+        response = self.reader_client.get(reverse("recipes-feed"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_feed_follows_subscriptions(self):
+        old_recipe = self.create_recipe("Старый рецепт")
+        self.reader_client.post(
+            reverse("users-subscribe", args=[self.author.id])
+        )
+        new_recipe = self.create_recipe("Новый рецепт")
+        self.assertEqual(self.get_feed_ids(), [new_recipe, old_recipe])
+
+        self.reader_client.delete(
+            reverse("users-subscribe", args=[self.author.id])
+        )
+        self.assertEqual(self.get_feed_ids(), [])
+        self.assertTrue(Recipe.objects.filter(id=new_recipe).exists())
+
+    def test_feed_follows_subscriptions_made_outside_the_api(self):
+        recipe = self.create_recipe("Рецепт")
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.get_feed_ids(), [recipe])
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author.delete()
+        self.assertEqual(self.get_feed_ids(), [])
+
+    def test_feed_pages_by_cursor(self):
+        self.reader_client.post(
+            reverse("users-subscribe", args=[self.author.id])
+        )
+        recipe_ids = [self.create_recipe(f"Рецепт {i}") for i in range(5)]
+        seen = []
+        url = reverse("recipes-feed") + "?limit=2"
+        while url:
+            response = self.reader_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(recipe["id"] for recipe in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, recipe_ids[::-1])
+
+    def test_feed_uses_fast_path_and_sparse_fields(self):
+        self.reader_client.post(
+            reverse("users-subscribe", args=[self.author.id])
+        )
+        recipe_ids = [self.create_recipe(f"Рецепт {i}") for i in range(4)]
+        Favorite.objects.create(user=self.reader, recipe_id=recipe_ids[0])
+
+        def count_queries(limit):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.reader_client.get(
+                    reverse("recipes-feed"), {"limit": limit}
+                )
+            self.assertEqual(len(response.data["results"]), limit)
+            return len(queries), response.data["results"]
+
+        few, _ = count_queries(1)
+        many, results = count_queries(4)
+        self.assertEqual(few, many)
+        self.assertEqual(
+            [recipe["is_favorited"] for recipe in results],
+            [False, False, False, True],
+        )
+
+        with patch("api.views.get_feed_page", wraps=get_feed_page) as page:
+            response = self.reader_client.get(
+                reverse("recipes-feed"), {"fields": "id,name"}
+            )
+        # Без фильтров лента читается без подзапроса рецептов.
+        self.assertIsNone(page.call_args.args[3])
+        self.assertEqual(
+            response.data["results"][0],
+            {"id": recipe_ids[-1], "name": "Рецепт 3"},
+        )
+
+    def test_feed_rejects_malformed_cursor(self):
+        for position in ("abc", "2024-01-01T00:00:00,abc"):
+            cursor = b64encode(f"p={position}".encode()).decode()
+            response = self.reader_client.get(
+                reverse("recipes-feed"), {"cursor": cursor}
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("kitchen.feed.FEED_FANOUT_MAX_FOLLOWERS", 1)
+    def test_feed_switches_fan_out_mode(self):
+        other = User.objects.create_user(
+            username="other",
+            email="other@example.com",
+            password="testpass123",
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        for client in (self.reader_client, other_client):
+            client.post(reverse("users-subscribe", args=[self.author.id]))
+        self.assertTrue(
+            FanOutOnReadAuthor.objects.filter(author=self.author).exists()
+        )
+
+        recipe = self.create_recipe("Рецепт для многих")
+        self.assertFalse(FeedEntry.objects.filter(recipe_id=recipe).exists())
+        self.assertEqual(self.get_feed_ids(), [recipe])
+
+        other_client.delete(reverse("users-subscribe", args=[self.author.id]))
+        self.assertFalse(
+            FanOutOnReadAuthor.objects.filter(author=self.author).exists()
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, recipe_id=recipe).exists()
+        )
+        self.assertEqual(self.get_feed_ids(), [recipe])
+
+
+class RecipeSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(4)
+        ]
+        recipe_index.reset()
+
+    def create_recipe(self, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name=name,
+            image="recipes/images/test.png",
+            text="Описание",
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def test_similar_recipes_are_ranked_by_overlap(self):
+        salt, pepper, oil, flour = self.ingredients
+        recipe = self.create_recipe("Исходный", [salt, pepper, oil])
+        close = self.create_recipe("Похожий", [salt, pepper, oil, flour])
+        distant = self.create_recipe("Далёкий", [salt, flour])
+        self.create_recipe("Чужой", [flour])
+
+        response = self.client.get(
+            reverse("recipes-similar", args=[recipe.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in response.data], [close.id, distant.id]
+        )
+
+    def test_pantry_ranks_by_missing_ingredients(self):
+        salt, pepper, oil, flour = self.ingredients
+        complete = self.create_recipe("Всё есть", [salt, pepper])
+        almost = self.create_recipe("Почти", [salt, pepper, flour])
+        self.create_recipe("Ничего нет", [oil, flour])
+
+        response = self.client.get(
+            reverse("recipes-pantry"),
+            {"ingredients": f"{salt.id},{pepper.id}", "max_missing": 1},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (item["id"], item["missing_ingredients"])
+                for item in response.data["results"]
+            ],
+            [(complete.id, 0), (almost.id, 1)],
+        )
+
+    def test_filter_by_included_and_excluded_ingredients(self):
+        salt, pepper, oil, flour = self.ingredients
+        matching = self.create_recipe("Подходит", [salt, pepper])
+        self.create_recipe("С мукой", [salt, pepper, flour])
+        self.create_recipe("Без перца", [salt, oil])
+
+        response = self.client.get(
+            reverse("recipes-list"),
+            {
+                "ingredients": f"{salt.id},{pepper.id}",
+                "exclude_ingredients": flour.id,
+                "cooking_time_max": 10,
+            },
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], [matching.id]
+        )
+
+    def test_ordering_by_popularity_uses_refreshed_scores(self):
+        salt = self.ingredients[0]
+        popular = self.create_recipe("Популярный", [salt])
+        quiet = self.create_recipe("Тихий", [salt])
+        fans = [
+            User.objects.create_user(
+                username=f"fan{number}",
+                email=f"fan{number}@example.com",
+                password="testpass123",
+            )
+            for number in range(2)
+        ]
+        for fan in fans:
+            Favorite.objects.create(user=fan, recipe=popular)
+        ShoppingCart.objects.create(user=fans[0], recipe=quiet)
+        refresh_scores()
+
+        response = self.client.get(
+            reverse("recipes-list"), {"ordering": "popular"}
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [popular.id, quiet.id],
+        )
+
+        fresh = self.create_recipe("Новый", [salt])
+        response = self.client.get(
+            reverse("recipes-list"), {"ordering": "popular"}
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [popular.id, quiet.id, fresh.id],
+        )
+
+
+class FastPathParityTestCase(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        self.authors = [
+            User.objects.create_user(
+                username=f"author{number}",
+                email=f"author{number}@example.com",
+                password="testpass123",
+                first_name="Автор",
+                avatar="users/avatars/avatar.png" if number else None,
+            )
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("соль", "перец", "мука")
+        ]
+        self.recipes = []
+        for number in range(4):
+            recipe = Recipe.objects.create(
+                author=self.authors[number % 2],
+                name=f"Рецепт {number}",
+                image="recipes/images/test.png",
+                text="Строка\u2028с «кавычками» и \"escape\"",
+                cooking_time=number + 1,
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=7)
+                for ingredient in ingredients[: number + 1]
+            )
+            self.recipes.append(recipe)
+        Favorite.objects.create(user=self.reader, recipe=self.recipes[0])
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipes[1])
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def assert_parity(self, url, params, serializer_class, queryset, paginated):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = serializer_class(
+            queryset,
+            many=True,
+            context={"request": response.renderer_context["request"]},
+        ).data
+        if paginated:
+            data = {
+                "count": len(data),
+                "next": None,
+                "previous": None,
+                "results": data,
+            }
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_recipe_list_matches_serializer(self):
+        self.assert_parity(
+            reverse("recipes-list"),
+            {},
+            RecipeReadSerializer,
+            Recipe.objects.all(),
+            paginated=True,
+        )
+
+    def test_anonymous_recipe_list_matches_serializer(self):
+        self.client.force_authenticate(None)
+        self.test_recipe_list_matches_serializer()
+
+    def test_ingredient_list_matches_serializer(self):
+        self.assert_parity(
+            reverse("ingredients-list"),
+            {},
+            IngredientSerializer,
+            Ingredient.objects.all(),
+            paginated=False,
+        )
+
+    def test_subscriptions_match_serializer(self):
+        for params in ({}, {"recipes_limit": 1}, {"recipes_limit": "x"}):
+            with self.subTest(params=params):
+                self.assert_parity(
+                    reverse("users-subscriptions"),
+                    params,
+                    SubscriptionSerializer,
+                    User.objects.filter(following__user=self.reader),
+                    paginated=True,
+                )
+
+    def test_sparse_recipe_fields_match_serializer(self):
+        for params in (
+            {"fields": "compact"},
+            {"omit": "text,ingredients"},
+            {"fields": "name,author", "omit": "author"},
+        ):
+            with self.subTest(params=params):
+                self.assert_parity(
+                    reverse("recipes-list"),
+                    params,
+                    RecipeReadSerializer,
+                    Recipe.objects.all(),
+                    paginated=True,
+                )
+
+    def test_compact_list_prunes_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("recipes-list"), {"fields": "compact"}
+            )
+        self.assertNotIn("text", response.data["results"][0])
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("kitchen_recipeingredient", sql)
+        self.assertNotIn('"kitchen_recipe"."text"', sql)
+
+    def test_sparse_recipe_detail(self):
+        response = self.client.get(
+            reverse("recipes-detail", args=[self.recipes[0].id]),
+            {"fields": "name"},
+        )
+        self.assertEqual(
+            response.data, {"id": self.recipes[0].id, "name": "Рецепт 0"}
+        )
+
+
+class BatchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user)}"
+        )
+
+    def test_batch_runs_get_requests_as_one_user(self):
+        response = self.client.post(
+            reverse("batch"),
+            {
+                "requests": [
+                    {"path": "/api/users/me/"},
+                    {"path": "/api/recipes/?limit=1"},
+                    {"path": "/api/ingredients/?name=со"},
+                    {"path": "/api/missing/"},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        me, recipes, ingredients, missing = response.json()["responses"]
+        self.assertEqual(me["body"]["username"], "reader")
+        self.assertEqual(recipes["body"]["count"], 0)
+        self.assertEqual(ingredients["body"][0]["name"], "соль")
+        self.assertEqual(missing["status"], status.HTTP_404_NOT_FOUND)
+
+    def test_batch_rejects_writes(self):
+        response = self.client.post(
+            reverse("batch"),
+            {"requests": [{"path": "/api/recipes/", "method": "POST"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.old_recipe = self.create_recipe("Старый")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author,
+            name=name,
+            image="recipes/images/test.png",
+            text="Описание",
+            cooking_time=10,
+        )
+
+    def sync(self, since=None):
+        params = {} if since is None else {"since": since}
+        response = self.client.get(reverse("sync"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_sync_returns_only_deltas_since_token(self):
+        token = self.sync()["token"]
+        recipe = self.create_recipe("Новый")
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        Favorite.objects.create(user=self.author, recipe=recipe)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        follow.delete()
+        deleted_id = self.old_recipe.id
+        self.old_recipe.delete()
+
+        data = self.sync(token)
+        self.assertEqual([item["id"] for item in data["recipes"]], [recipe.id])
+        self.assertTrue(data["recipes"][0]["is_favorited"])
+        self.assertEqual(data["deleted_recipes"], [deleted_id])
+        self.assertEqual(
+            data["favorites"], {"added": [recipe.id], "removed": []}
+        )
+        self.assertEqual(
+            data["subscriptions"], {"added": [], "removed": [self.author.id]}
+        )
+        self.assertFalse(data["has_more"])
+
+        data = self.sync(data["token"])
+        self.assertEqual(data["recipes"], [])
+        self.assertEqual(data["deleted_recipes"], [])
+
+    def test_pruned_token_requires_full_reload(self):
+        token = self.sync()["token"]
+        self.create_recipe("Новый")
+        self.create_recipe("Ещё новее")
+        Change.objects.update(created=timezone.now() - timedelta(days=365))
+        call_command("prune_changes", stdout=StringIO())
+        self.assertEqual(Change.objects.count(), 1)
+
+        response = self.client.get(reverse("sync"), {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data["token"], self.sync()["token"])
+        self.sync(response.data["token"])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_token_skips_unsettled_changes(self):
+        Change.objects.update(created=timezone.now() - timedelta(minutes=5))
+        settled = Change.objects.order_by("-id").first().id
+        recipe = self.create_recipe("Новый")
+        self.assertEqual(self.sync()["token"], str(settled))
+
+        # Изменение с меньшим id может зафиксироваться позже: токен не
+        # должен через него перескочить.
+        Change.objects.filter(object_id=recipe.id).update(
+            created=timezone.now() - timedelta(minutes=5)
+        )
+        data = self.sync(settled)
+        self.assertEqual([item["id"] for item in data["recipes"]], [recipe.id])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShoppingListCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            password="testpass123",
+        )
+        self.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("recipes-list"), self.recipe_data(5), format="json"
+        )
+        self.recipe_id = response.data["id"]
+        self.client.post(
+            reverse("recipes-shopping-cart", args=[self.recipe_id])
+        )
+
+    def recipe_data(self, amount):
+        return {
+            "name": "Рецепт",
+            "text": "Описание",
+            "cooking_time": 10,
+            "image": IMAGE,
+            "ingredients": [{"id": self.salt.id, "amount": amount}],
+        }
+
+    def download(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(
+            reverse("recipes-download-shopping-cart"), **headers
+        )
+
+    def test_repeat_download_is_not_modified_until_cart_changes(self):
+        first = self.download()
+        self.assertEqual(first.content.decode(), "соль (г) — 5")
+        with CaptureQueriesContext(connection) as queries:
+            repeated = self.download(first["ETag"])
+        self.assertEqual(repeated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
+
+        self.client.patch(
+            reverse("recipes-detail", args=[self.recipe_id]),
+            self.recipe_data(7),
+            format="json",
+        )
+        changed = self.download(first["ETag"])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.content.decode(), "соль (г) — 7")
+
+        self.client.delete(
+            reverse("recipes-shopping-cart", args=[self.recipe_id])
+        )
+        self.assertEqual(self.download(changed["ETag"]).content, b"")
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            password="testpass123",
+        )
+        self.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self):
+        response = self.client.post(
+            reverse("recipes-list"),
+            {
+                "name": "Рецепт",
+                "text": "Описание",
+                "cooking_time": 10,
+                "image": IMAGE,
+                "ingredients": [{"id": self.salt.id, "amount": 1}],
+            },
+            format="json",
+        )
+        return Recipe.objects.get(id=response.data["id"])
+
+    @patch("core.storage.MEDIA_GC_GRACE_SECONDS", 0)
+    def test_identical_uploads_share_file_until_last_reference(self):
+        first = self.create_recipe()
+        second = self.create_recipe()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("cas/"))
+        path = first.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_recently_uploaded_file_is_left_to_sweep(self):
+        recipe = self.create_recipe()
+        path = recipe.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        # Такую же картинку могут загружать прямо сейчас.
+        self.assertTrue(os.path.exists(path))
+
+        call_command("sweep_media", stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+        with patch("core.storage.MEDIA_GC_GRACE_SECONDS", 0):
+            call_command("sweep_media", stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SoftDeleteTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        self.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            reverse("recipes-list"),
+            {
+                "name": "Рецепт",
+                "text": "Описание",
+                "cooking_time": 10,
+                "image": IMAGE,
+                "ingredients": [{"id": self.salt.id, "amount": 1}],
+            },
+            format="json",
+        )
+        self.recipe = Recipe.objects.get(id=response.data["id"])
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Follow.objects.create(user=self.reader, author=self.author)
+        recipe_index.reset()
+        recipe_index.ensure_fresh()
+
+    def purge(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_deleted", batch_size=1, stdout=StringIO())
+
+    @patch("core.storage.MEDIA_GC_GRACE_SECONDS", 0)
+    def test_deleted_recipe_is_hidden_then_purged(self):
+        path = self.recipe.image.path
+        self.assertIn(self.recipe.id, recipe_index.recipe_ingredients)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse("recipes-detail", args=[self.recipe.id])
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(reverse("recipes-list")).data["count"], 0
+        )
+        self.assertTrue(Recipe.all_objects.filter(id=self.recipe.id).exists())
+        self.assertNotIn(self.recipe.id, recipe_index.recipe_ingredients)
+
+        self.purge()
+        self.assertFalse(Recipe.all_objects.filter(id=self.recipe.id).exists())
+        self.assertFalse(
+            RecipeIngredient.objects.filter(recipe_id=self.recipe.id).exists()
+        )
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_deleted_user_is_hidden_then_purged(self):
+        Token.objects.create(user=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_users(User.objects.filter(id=self.author.id))
+        self.assertFalse(Token.objects.filter(user=self.author).exists())
+        self.assertFalse(Recipe.objects.exists())
+        self.client.force_authenticate(self.reader)
+        usernames = [
+            user["username"]
+            for user in self.client.get(reverse("users-list")).data["results"]
+        ]
+        self.assertEqual(usernames, ["reader"])
+        response = self.client.get(reverse("users-subscriptions"))
+        self.assertEqual(response.data["count"], 0)
+
+        self.purge()
+        self.assertFalse(User.objects.filter(id=self.author.id).exists())
+        self.assertFalse(Recipe.all_objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(User.objects.filter(id=self.reader.id).exists())
@@ -1,14 +1,27 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api.views import UserViewSet
-from api.views import RecipeViewSet, IngredientViewSet
+from api.views import RecipeViewSet, IngredientViewSet, events_ticket, sync
+from api.views import AuthorStatsViewSet, IngredientUsageViewSet
+from api.batch import batch
 
 router = DefaultRouter()
 router.register("users", UserViewSet, basename="users")
 router.register("recipes", RecipeViewSet, basename="recipes")
 router.register("ingredients", IngredientViewSet, basename="ingredients")
+router.register(
+    "analytics/ingredients",
+    IngredientUsageViewSet,
+    basename="analytics-ingredients",
+)
+router.register(
+    "analytics/authors", AuthorStatsViewSet, basename="analytics-authors"
+)
 
 urlpatterns = [
+    path("batch/", batch, name="batch"),
+    path("sync/", sync, name="sync"),
+    path("events/ticket/", events_ticket, name="events-ticket"),
     path("", include(router.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,33 +1,65 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponse
 from django.urls import reverse
-from rest_framework import viewsets, permissions
-from rest_framework.decorators import action
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import filters, viewsets, permissions
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib.auth import get_user_model
 from kitchen.models import (
+    Change,
     Recipe,
     Favorite,
     ShoppingCart,
-    RecipeIngredient,
     Ingredient,
 )
+from kitchen.deletion import soft_delete_recipes, soft_delete_users
+from kitchen.feed import get_feed_page
+from kitchen.lookups import (
+    get_ingredient_rows,
+    get_recipe_id_by_short_link,
+    get_shopping_list,
+    get_shopping_list_version,
+)
+from kitchen.sync import get_changes, get_current_token, is_token_expired
+from kitchen.search import recipe_index
+from kitchen.suggestions import follow_graph
+from analytics.models import AuthorStats, IngredientUsage
 from users.models import Follow
 from api.serializers import (
     RecipeReadSerializer,
     RecipeWriteSerializer,
     IngredientSerializer,
+    IngredientUsageSerializer,
+    AuthorStatsSerializer,
+    PantryQuerySerializer,
     RecipeActionSerializer,
     SubscriptionSerializer,
     SetPasswordSerializer,
     UserSerializer,
     UserCreateSerializer,
     FollowCreateSerializer,
+    get_sparse_fields,
+)
+from api.fastpath import (
+    serialize_profile,
+    serialize_recipes,
+    serialize_subscriptions,
 )
+from api.pagination import FeedCursorPagination, UserCursorPagination
 from api.permissions import IsAuthorOrReadOnly
-from api.filters import RecipeFilter
+from api.filters import RecipeFilter, RecipeRankingFilter, UserFilter
+from core.events import make_ticket
+from core.constants import (
+    EVENTS_TICKET_MAX_AGE,
+    SIMILAR_RECIPES_CACHE_SIZE,
+    SIMILAR_RECIPES_DEFAULT_LIMIT,
+    SUGGESTIONS_CACHE_SIZE,
+    SUGGESTIONS_DEFAULT_LIMIT,
+)
 from http import HTTPStatus
 
 
@@ -40,7 +72,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrReadOnly,
     ]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RecipeRankingFilter]
     filterset_class = RecipeFilter
 
     def get_serializer_class(self):
@@ -48,9 +80,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "retrieve":
+            return queryset
+        fields = get_sparse_fields(self.request, RecipeReadSerializer)
+        if "author" in fields:
+            queryset = queryset.select_related("author")
+        if "ingredients" in fields:
+            queryset = queryset.prefetch_related(
+                "recipe_ingredients__ingredient"
+            )
+        if "text" not in fields:
+            queryset = queryset.defer("text")
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        recipe_ids = queryset.values_list("id", flat=True)
+        fields = get_sparse_fields(request, RecipeReadSerializer)
+        page = self.paginate_queryset(recipe_ids)
+        if page is not None:
+            return self.get_paginated_response(
+                serialize_recipes(page, request, fields)
+            )
+        return Response(serialize_recipes(recipe_ids, request, fields))
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        soft_delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -106,25 +167,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated],
     )
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__in_shopping_carts__user=request.user
+        user_id = request.user.id
+        version = get_shopping_list_version(user_id)
+        etag = quote_etag(version)
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponse(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            content = get_shopping_list(user_id, version)
+            filename = "shopping_list.txt"
+
+            response = HttpResponse(content, content_type="text/plain")
+            response["Content-Disposition"] = (
+                f'attachment; filename="{filename}"'
             )
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total=Sum("amount"))
-            .order_by("ingredient__name")
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated],
+        pagination_class=FeedCursorPagination,
+    )
+    def feed(self, request):
+        recipes = None
+        # Фильтры передаются в ленту подзапросом, только если заданы.
+        filterset = RecipeFilter(
+            request.query_params, queryset=Recipe.objects.all(), request=request
+        )
+        if filterset.has_filters():
+            recipes = self.filter_queryset(Recipe.objects.all())
+        recipe_ids = self.paginator.paginate_feed(
+            lambda limit, before: get_feed_page(
+                request.user, limit, before, recipes
+            ),
+            request,
+        )
+        fields = get_sparse_fields(request, RecipeReadSerializer)
+        return self.get_paginated_response(
+            serialize_recipes(recipe_ids, request, fields)
         )
 
-        lines = [
-            f"{item['ingredient__name']} ({item['ingredient__measurement_unit']}) — {item['total']}"
-            for item in ingredients
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        try:
+            limit = int(
+                request.query_params.get(
+                    "limit", SIMILAR_RECIPES_DEFAULT_LIMIT
+                )
+            )
+        except ValueError:
+            limit = SIMILAR_RECIPES_DEFAULT_LIMIT
+        limit = max(1, min(limit, SIMILAR_RECIPES_CACHE_SIZE))
+        ranked_ids = [
+            recipe_id for recipe_id, _ in recipe_index.similar(recipe.id, limit)
         ]
-        content = "\n".join(lines)
-        filename = "shopping_list.txt"
+        recipes = Recipe.objects.in_bulk(ranked_ids)
+        ranked_recipes = [
+            recipes[recipe_id]
+            for recipe_id in ranked_ids
+            if recipe_id in recipes
+        ]
+        serializer = RecipeActionSerializer(
+            ranked_recipes,
+            many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
 
-        response = HttpResponse(content, content_type="text/plain")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+    @action(detail=False, methods=["get"])
+    def pantry(self, request):
+        params = PantryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        found = recipe_index.find_cookable(
+            params.validated_data["ingredients"],
+            params.validated_data["max_missing"],
+        )
+        page = self.paginate_queryset(found)
+        recipes = (
+            Recipe.objects.select_related("author")
+            .prefetch_related("recipe_ingredients__ingredient")
+            .in_bulk([recipe_id for recipe_id, _ in page])
+        )
+        page = [
+            (recipes[recipe_id], missing)
+            for recipe_id, missing in page
+            if recipe_id in recipes
+        ]
+        serializer = RecipeReadSerializer(
+            [recipe for recipe, _ in page],
+            many=True,
+            context={"request": request},
+        )
+        data = serializer.data
+        for item, (_, missing) in zip(data, page):
+            item["missing_ingredients"] = missing
+        return self.get_paginated_response(data)
 
     @action(detail=True, methods=["get"], url_path="get-link")
     def get_short_link(self, request, pk=None):
@@ -134,11 +274,88 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 def redirect_short_link(request, slug):
-    recipe = get_object_or_404(Recipe, short_uuid=slug)
-    url = reverse("recipes-detail", args=[recipe.id])
+    recipe_id = get_recipe_id_by_short_link(slug)
+    if recipe_id is None:
+        raise Http404
+    url = reverse("recipes-detail", args=[recipe_id])
     return redirect(url)
 
 
+SYNC_USER_KINDS = {
+    Change.FAVORITE: "favorites",
+    Change.SHOPPING_CART: "shopping_cart",
+    Change.FOLLOW: "subscriptions",
+}
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def events_ticket(request):
+    """Билет для подключения к /api/events/?ticket= из EventSource."""
+    return Response(
+        {
+            "ticket": make_ticket(request.user.id),
+            "expires_in": EVENTS_TICKET_MAX_AGE,
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def sync(request):
+    """Изменения после токена ?since=.
+
+    Без since возвращает только текущий токен: клиент загружает данные
+    целиком и дальше запрашивает изменения с этого токена. Если изменения
+    после since уже удалены из журнала, ответ 410 с текущим токеном
+    означает то же: загрузить всё заново.
+    """
+    since = request.query_params.get("since")
+    if since is None:
+        return Response({"token": str(get_current_token())})
+    try:
+        since = int(since)
+    except ValueError:
+        return Response(
+            {"since": "Некорректный токен."}, status=HTTPStatus.BAD_REQUEST
+        )
+    if is_token_expired(since):
+        return Response(
+            {
+                "detail": "Токен устарел, загрузите данные заново.",
+                "token": str(get_current_token()),
+            },
+            status=HTTPStatus.GONE,
+        )
+    changes, token, has_more = get_changes(request.user, since)
+    updated_recipes = []
+    data = {
+        "token": str(token),
+        "has_more": has_more,
+        "recipes": [],
+        "deleted_recipes": [],
+    }
+    for key in SYNC_USER_KINDS.values():
+        data[key] = {"added": [], "removed": []}
+    for (kind, object_id), deleted in changes.items():
+        if kind == Change.RECIPE:
+            if deleted:
+                data["deleted_recipes"].append(object_id)
+            else:
+                updated_recipes.append(object_id)
+        else:
+            data[SYNC_USER_KINDS[kind]][
+                "removed" if deleted else "added"
+            ].append(object_id)
+    if updated_recipes:
+        data["recipes"] = serialize_recipes(
+            updated_recipes,
+            request,
+            get_sparse_fields(request, RecipeReadSerializer),
+        )
+    return Response(data)
+
+
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -151,6 +368,41 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
             return self.queryset.filter(name__istartswith=name)
         return self.queryset
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name", "")
+        return Response(get_ingredient_rows(name))
+
+
+class IngredientUsageViewSet(viewsets.ReadOnlyModelViewSet):
+    """Самые используемые ингредиенты из сводок analytics."""
+
+    queryset = (
+        IngredientUsage.objects.with_averages()
+        .select_related("ingredient")
+        .order_by("-recipes_count", "ingredient_id")
+    )
+    serializer_class = IngredientUsageSerializer
+    permission_classes = [permissions.AllowAny]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["recipes_count", "average_cooking_time"]
+
+
+class AuthorStatsViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = (
+        AuthorStats.objects.with_averages()
+        .filter(author__deleted_at__isnull=True)
+        .select_related("author")
+        .order_by("-recipes_count", "author_id")
+    )
+    serializer_class = AuthorStatsSerializer
+    permission_classes = [permissions.AllowAny]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = [
+        "recipes_count",
+        "average_cooking_time",
+        "average_ingredients",
+    ]
+
 
 # class SubscribeViewSet(viewsets.ViewSet):
 #     permission_classes = [permissions.IsAuthenticated]
@@ -216,8 +468,36 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     permission_classes = [permissions.AllowAny]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(user=user, author=OuterRef("pk"))
+                )
+            )
+        return queryset
+
+    @property
+    def paginator(self):
+        # Постраничный вывод по умолчанию; ?cursor= включает keyset-пагинацию
+        # по username, которой не нужен COUNT(*) и OFFSET.
+        if (
+            not hasattr(self, "_paginator")
+            and self.action == "list"
+            and "cursor" in self.request.query_params
+        ):
+            self._paginator = UserCursorPagination()
+        return super().paginator
+
+    def perform_destroy(self, instance):
+        soft_delete_users(User.objects.filter(pk=instance.pk))
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -226,10 +506,12 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=["get", "put"],
+        methods=["get", "put", "patch"],
         permission_classes=[permissions.IsAuthenticated],
     )
     def me(self, request):
+        if request.method == "GET":
+            return Response(serialize_profile(request))
         serializer = UserSerializer(
             request.user,
             data=request.data,
@@ -297,15 +579,35 @@ class UserViewSet(viewsets.ModelViewSet):
         author_ids = Follow.objects.filter(user=request.user).values_list(
             "author", flat=True
         )
-        authors_qs = User.objects.filter(pk__in=author_ids)
+        authors_qs = User.objects.filter(
+            pk__in=author_ids, deleted_at__isnull=True
+        ).values_list("id", flat=True)
         page = self.paginate_queryset(authors_qs)
         if page is not None:
-            serializer = SubscriptionSerializer(
-                page, many=True, context={"request": request}
+            return self.get_paginated_response(
+                serialize_subscriptions(page, request)
             )
-            return self.get_paginated_response(serializer.data)
-        serializer = SubscriptionSerializer(
-            authors_qs, many=True, context={"request": request}
+        return Response(serialize_subscriptions(authors_qs, request))
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def suggestions(self, request):
+        try:
+            limit = int(
+                request.query_params.get("limit", SUGGESTIONS_DEFAULT_LIMIT)
+            )
+        except ValueError:
+            limit = SUGGESTIONS_DEFAULT_LIMIT
+        limit = max(1, min(limit, SUGGESTIONS_CACHE_SIZE))
+        ranked_ids = follow_graph.suggest(request.user.id, limit)
+        users = self.get_queryset().in_bulk(ranked_ids)
+        serializer = UserSerializer(
+            [users[user_id] for user_id in ranked_ids if user_id in users],
+            many=True,
+            context={"request": request},
         )
         return Response(serializer.data)
 
@@ -316,7 +618,7 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated],
     )
     def subscribe(self, request, pk=None):
-        author = get_object_or_404(User, pk=pk)
+        author = get_object_or_404(self.queryset, pk=pk)
         data = {
             "user": request.user.id,
             "author": author.id,
@@ -0,0 +1,127 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from core.models import QueryFingerprint, RequestProfile, SlowQuery
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created",
+        "method",
+        "path",
+        "status_code",
+        "duration",
+        "get_queries_count",
+        "user",
+    )
+    list_select_related = ("user",)
+    list_filter = ("method", "status_code")
+    search_fields = ("path",)
+    exclude = ("raw_stats", "queries")
+    readonly_fields = (
+        "created",
+        "user",
+        "method",
+        "path",
+        "status_code",
+        "duration",
+        "get_download_link",
+        "stats",
+        "get_queries",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="core_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.raw_stats), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="profile_{profile.pk}.prof"'
+        )
+        return response
+
+    def get_queries_count(self, obj):
+        return len(obj.queries)
+
+    get_queries_count.short_description = "SQL-запросов"
+
+    def get_download_link(self, obj):
+        url = reverse("admin:core_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">Скачать .prof</a>', url)
+
+    get_download_link.short_description = "Файл профиля"
+
+    def get_queries(self, obj):
+        return format_html(
+            "<ol>{}</ol>",
+            format_html_join(
+                "",
+                "<li><code>{}</code> {} ({} с)</li>",
+                (
+                    (query["sql"], query["params"], query["time"])
+                    for query in obj.queries
+                ),
+            ),
+        )
+
+    get_queries.short_description = "SQL-запросы"
+
+
+class SlowQueryInline(admin.StackedInline):
+    model = SlowQuery
+    extra = 0
+    can_delete = False
+    fields = ("created", "duration", "call_site", "params", "plan")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(QueryFingerprint)
+class QueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = (
+        "sql",
+        "calls",
+        "total_duration",
+        "get_average_duration",
+        "max_duration",
+        "last_seen",
+    )
+    search_fields = ("sql",)
+    readonly_fields = (
+        "fingerprint",
+        "sql",
+        "calls",
+        "total_duration",
+        "max_duration",
+        "last_seen",
+    )
+    inlines = [SlowQueryInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_average_duration(self, obj):
+        return round(obj.total_duration / obj.calls, 1) if obj.calls else 0
+
+    get_average_duration.short_description = "В среднем, мс"
@@ -0,0 +1,191 @@
+import csv
+from functools import reduce
+from operator import or_
+
+from django.contrib import admin
+from django.core.exceptions import FieldDoesNotExist, PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.http import StreamingHttpResponse
+from django.urls import path
+from django.utils.functional import cached_property
+
+from core.constants import ADMIN_EXACT_COUNT_LIMIT, CSV_EXPORT_CHUNK_SIZE
+
+
+def get_estimated_count(model, using):
+    """Оценка числа строк из статистики Postgres, без полного COUNT(*)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+def is_soft_delete_filter(queryset):
+    """Отфильтрованы ли только мягко удалённые строки (deleted_at)."""
+    model = queryset.model
+    try:
+        model._meta.get_field("deleted_at")
+    except FieldDoesNotExist:
+        return False
+    visible = model._base_manager.filter(deleted_at__isnull=True)
+    return queryset.query.where == visible.query.where
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц.
+
+    Для списка без фильтров на Postgres берёт оценку из pg_class, если
+    она превышает ADMIN_EXACT_COUNT_LIMIT; в остальных случаях считает
+    точно. Скрытые мягким удалением строки вычитаются из оценки: их
+    немного, и считаются они по частичному индексу deleted_at.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        using = queryset.db
+        if connections[using].vendor == "postgresql":
+            estimate = None
+            if not queryset.query.where:
+                estimate = get_estimated_count(queryset.model, using)
+            elif is_soft_delete_filter(queryset):
+                estimate = (
+                    get_estimated_count(queryset.model, using)
+                    - queryset.model._base_manager.filter(
+                        deleted_at__isnull=False
+                    ).count()
+                )
+            if estimate is not None and estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class PrefixSearchMixin:
+    """Поиск в админке по префиксу: LOWER(поле) LIKE 'префикс%'.
+
+    Такие условия используют функциональные индексы LOWER(...)
+    text_pattern_ops, в отличие от icontains и UPPER(...) у istartswith.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        terms = search_term.lower().split()
+        if not search_fields or not terms:
+            return queryset, False
+        aliases = {
+            f"search_{number}": Lower(field)
+            for number, field in enumerate(search_fields)
+        }
+        queryset = queryset.alias(**aliases)
+        for term in terms:
+            queryset = queryset.filter(
+                reduce(
+                    or_,
+                    (Q(**{f"{alias}__startswith": term}) for alias in aliases),
+                )
+            )
+        return queryset, False
+
+
+class LargeTableAdmin(PrefixSearchMixin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class SoftDeleteMixin:
+    """Удаление из админки через мягкое удаление.
+
+    soft_delete — функция, принимающая QuerySet. Страница подтверждения
+    не собирает каскад связанных объектов: их удалит purge_deleted.
+    """
+
+    soft_delete = None
+
+    def delete_model(self, request, obj):
+        self.soft_delete(self.model._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
+
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает строку, а не копит её."""
+
+    def write(self, value):
+        return value
+
+
+# Ячейку с таким началом Excel и LibreOffice выполняют как формулу.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def escape_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([escape_cell(value) for value in row])
+
+
+class CsvExportMixin:
+    """Потоковая выгрузка в CSV для админки.
+
+    Действие «Выгрузить в CSV» выгружает выбранные строки (или все
+    отфильтрованные при «выбрать все»), а <changelist>/export/ —
+    весь список с текущими фильтрами и поиском из query string.
+    Строки читаются через .iterator(), поэтому память не зависит от
+    размера выгрузки.
+    """
+
+    csv_fields = ()
+    actions = ["export_csv"]
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name=f"{opts.app_label}_{opts.model_name}_export",
+            ),
+        ] + super().get_urls()
+
+    def export_response(self, queryset):
+        rows = (
+            queryset.order_by("pk")
+            .values_list(*self.csv_fields)
+            .iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+        )
+        response = StreamingHttpResponse(
+            stream_csv(self.csv_fields, rows),
+            content_type="text/csv; charset=utf-8",
+        )
+        filename = f"{self.model._meta.model_name}.csv"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        # Иначе nginx буферизует ответ целиком во временный файл.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @admin.action(description="Выгрузить в CSV")
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset)
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return self.export_response(changelist.queryset)
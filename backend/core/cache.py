@@ -0,0 +1,231 @@
+"""Двухуровневый кэш.
+
+Перед общим кэшем Django (settings.CACHES, общий для воркеров) стоит
+LRU в памяти процесса с коротким TTL, поэтому горячие ключи читаются
+без обращения к общему кэшу. Ключи можно объединять в пространства
+имён с версией: bump() инвалидирует все ключи пространства сразу,
+другие процессы увидят новую версию не позже чем через
+LOCAL_CACHE_TTL секунд.
+
+От «толпы» при промахе защищают блокировка в общем кэше (значение
+вычисляет один процесс, остальные ждут его результат или отдают
+устаревшее значение) и вероятностное раннее обновление (XFetch):
+незадолго до истечения срока отдельные запросы пересчитывают значение
+заранее.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.core.cache import caches
+
+from core.constants import (
+    CACHE_EARLY_REFRESH_BETA,
+    CACHE_LOCK_TIMEOUT,
+    CACHE_LOCK_WAIT,
+    LOCAL_CACHE_MAX_ENTRIES,
+    LOCAL_CACHE_TTL,
+)
+from core.metrics import record_cache_lookup
+
+MISSING = object()
+LOCK_POLL_INTERVAL = 0.05
+
+
+class LocalLRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return MISSING
+            value, expires = item
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache:
+    def __init__(
+        self,
+        alias="default",
+        max_entries=LOCAL_CACHE_MAX_ENTRIES,
+        local_ttl=LOCAL_CACHE_TTL,
+    ):
+        self.alias = alias
+        self.local = LocalLRU(max_entries)
+        self.local_ttl = local_ttl
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_version(self, namespace, use_local=True):
+        """Версия пространства имён.
+
+        use_local=False читает версию только из общего кэша: изменение из
+        другого процесса видно сразу, а не через LOCAL_CACHE_TTL.
+        """
+        key = f"ns:{namespace}"
+        version = self.local.get(key) if use_local else MISSING
+        if version is MISSING:
+            version = self.shared.get(key)
+            if version is None:
+                # Начальная версия берётся от времени: если общий кэш
+                # потеряет счётчик, старые ключи пространства не оживут.
+                version = time.time_ns()
+                if not self.shared.add(key, version, None):
+                    version = self.shared.get(key, version)
+            self.local.set(key, version, self.local_ttl)
+        return version
+
+    def bump(self, namespace):
+        key = f"ns:{namespace}"
+        version = max(time.time_ns(), (self.shared.get(key) or 0) + 1)
+        self.shared.set(key, version, None)
+        self.local.set(key, version, self.local_ttl)
+
+    def make_key(self, key, namespace=None):
+        if namespace is None:
+            return key
+        return f"{namespace}:{self.get_version(namespace)}:{key}"
+
+    def get_or_set(self, key, compute, timeout, namespace=None, name=None):
+        full_key = self.make_key(key, namespace)
+        name = name or key
+        value = self.local.get(full_key)
+        if value is not MISSING:
+            record_cache_lookup(name, True)
+            return value
+        entry = self.shared.get(full_key)
+        if entry is not None and not self.should_refresh(entry):
+            record_cache_lookup(name, True)
+            value, expires_at, _ = entry
+            self.local.set(
+                full_key, value, min(self.local_ttl, expires_at - time.time())
+            )
+            return value
+        record_cache_lookup(name, False)
+        return self.recompute(full_key, compute, timeout, stale=entry)
+
+    @staticmethod
+    def should_refresh(entry):
+        # XFetch: вероятность обновить раньше срока растёт по мере
+        # приближения к нему и тем выше, чем дольше считается значение.
+        _, expires_at, delta = entry
+        jitter = -delta * CACHE_EARLY_REFRESH_BETA * math.log(random.random())
+        return time.time() + jitter >= expires_at
+
+    def recompute(self, full_key, compute, timeout, stale=None):
+        lock_key = f"lock:{full_key}"
+        if not self.shared.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+            if stale is not None:
+                return stale[0]
+            deadline = time.monotonic() + CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                entry = self.shared.get(full_key)
+                if entry is not None:
+                    return entry[0]
+            return compute()
+        try:
+            started = time.monotonic()
+            value = compute()
+            self.store(full_key, value, timeout, time.monotonic() - started)
+        finally:
+            self.shared.delete(lock_key)
+        return value
+
+    def store(self, full_key, value, timeout, delta=0):
+        self.shared.set(full_key, (value, time.time() + timeout, delta), timeout)
+        self.local.set(full_key, value, min(self.local_ttl, timeout))
+
+    def get_many(self, keys, namespace=None, name="default"):
+        """Значения для найденных ключей; без блокировок и раннего
+        обновления, недостающее вызывающий код считает сам."""
+        full_keys = {self.make_key(key, namespace): key for key in keys}
+        found = {}
+        missing = []
+        for full_key, key in full_keys.items():
+            value = self.local.get(full_key)
+            if value is MISSING:
+                missing.append(full_key)
+            else:
+                found[key] = value
+        now = time.time()
+        for full_key, entry in self.shared.get_many(missing).items():
+            value, expires_at, _ = entry
+            self.local.set(full_key, value, min(self.local_ttl, expires_at - now))
+            found[full_keys[full_key]] = value
+        record_cache_lookup(name, True, len(found))
+        record_cache_lookup(name, False, len(full_keys) - len(found))
+        return found
+
+    def set_many(self, mapping, timeout, namespace=None):
+        expires_at = time.time() + timeout
+        entries = {}
+        for key, value in mapping.items():
+            full_key = self.make_key(key, namespace)
+            entries[full_key] = (value, expires_at, 0)
+            self.local.set(full_key, value, min(self.local_ttl, timeout))
+        self.shared.set_many(entries, timeout)
+
+    def delete(self, key, namespace=None):
+        full_key = self.make_key(key, namespace)
+        self.local.delete(full_key)
+        self.shared.delete(full_key)
+
+
+tiered_cache = TieredCache()
+
+
+def cached(name, timeout, namespace=None):
+    """Кэширует результат функции по её позиционным аргументам.
+
+    wrapper.invalidate(*args) удаляет значение для этих аргументов.
+    """
+
+    def decorator(func):
+        def make_key(args):
+            return ":".join([name, *map(str, args)])
+
+        @wraps(func)
+        def wrapper(*args):
+            return tiered_cache.get_or_set(
+                make_key(args),
+                lambda: func(*args),
+                timeout,
+                namespace=namespace,
+                name=name,
+            )
+
+        wrapper.invalidate = lambda *args: tiered_cache.delete(
+            make_key(args), namespace=namespace
+        )
+        return wrapper
+
+    return decorator
@@ -4,4 +4,78 @@ MAX_COOKING_TIME = 32_000
 
 # Для поля amount (ингредиентов)
 MIN_INGREDIENT_AMOUNT = 1
-MAX_INGREDIENT_AMOUNT = 32_000
\ No newline at end of file
+MAX_INGREDIENT_AMOUNT = 32_000
+
+# Лента подписок: авторы с большим числом подписчиков
+# не раскладываются по лентам при публикации, а подмешиваются при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 5_000
+FEED_BACKFILL_RECIPES = 100
+
+# Похожие рецепты: сколько лучших результатов хранится для каждого рецепта
+SIMILAR_RECIPES_CACHE_SIZE = 50
+SIMILAR_RECIPES_DEFAULT_LIMIT = 6
+
+# Поиск по продуктам: сколько ингредиентов может не хватать
+PANTRY_DEFAULT_MAX_MISSING = 2
+PANTRY_MAX_MISSING = 10
+
+# Рекомендации авторов: сколько id хранится для пользователя, сколько
+# кандидатов взвешивается по общему избранному и сколько изменений графа
+# копится до слияния с массивами
+SUGGESTIONS_CACHE_SIZE = 50
+SUGGESTIONS_DEFAULT_LIMIT = 10
+SUGGESTIONS_CANDIDATES = 500
+SUGGESTIONS_MAX_FRIENDS = 300
+SUGGESTIONS_DELTA_LIMIT = 10_000
+SUGGESTIONS_CATCH_UP_SECONDS = 5
+
+# Тренды: учитываются добавления в избранное и корзину за окно,
+# вес события убывает вдвое каждые TRENDING_HALF_LIFE_HOURS часов.
+TRENDING_WINDOW_DAYS = 7
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Пакетные запросы: максимум подзапросов в одном /api/batch/
+BATCH_MAX_REQUESTS = 10
+
+# Админка: до этого числа строк пагинатор считает COUNT(*) точно
+ADMIN_EXACT_COUNT_LIMIT = 100_000
+
+# Выгрузка CSV из админки: строк за одну выборку из курсора
+CSV_EXPORT_CHUNK_SIZE = 2_000
+
+# Синхронизация: сколько записей журнала изменений отдаётся за запрос
+SYNC_MAX_CHANGES = 500
+
+# SSE: интервал комментария-пинга и очередь событий на одно соединение
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_QUEUE_SIZE = 100
+# SSE: сколько секунд действителен билет для подключения из EventSource
+EVENTS_TICKET_MAX_AGE = 60
+
+# Двухуровневый кэш (core/cache.py): LRU процесса перед общим кэшем
+LOCAL_CACHE_MAX_ENTRIES = 10_000
+LOCAL_CACHE_TTL = 5
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2
+CACHE_EARLY_REFRESH_BETA = 1.0
+
+# Сроки хранения горячих данных в кэше, секунды
+INGREDIENTS_CACHE_TIMEOUT = 24 * 60 * 60
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+SHORT_LINK_CACHE_TIMEOUT = 24 * 60 * 60
+SHOPPING_LIST_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Кэш ответов для анонимных запросов: срок на сервере и max-age для
+# клиентов и микрокэша nginx
+ANONYMOUS_CACHE_TIMEOUT = 10 * 60
+ANONYMOUS_CACHE_MAX_AGE = 5
+
+# Очистка удалённых пользователей и рецептов: строк в одной пачке
+PURGE_BATCH_SIZE = 1_000
+
+# Медиа: файл без ссылок удаляется, только если его не загружали заново
+# дольше этого срока; более свежие подчищает команда sweep_media
+MEDIA_GC_GRACE_SECONDS = 3_600
+
+# Аналитика: рецептов в одной пачке при пересборке сводок
+ANALYTICS_REBUILD_BATCH_SIZE = 1_000
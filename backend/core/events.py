@@ -0,0 +1,302 @@
+"""Server-Sent Events: живые обновления корзины, избранного и ленты.
+
+Публикация идёт через NOTIFY в Postgres, поэтому событие доходит до
+всех процессов с SSE-соединениями и только после фиксации транзакции.
+В каждом процессе одно соединение слушает канал (LISTEN) и раздаёт
+события подписчикам через EventHub; открытое SSE-соединение стоит
+одну корутину и одну очередь.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.db import close_old_connections, connection, connections
+
+from core.constants import (
+    EVENTS_HEARTBEAT_SECONDS,
+    EVENTS_QUEUE_SIZE,
+    EVENTS_TICKET_MAX_AGE,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "foodgram_events"
+FOLLOW_EVENT = "follow"
+LISTEN_RETRY_SECONDS = 5
+TICKET_SALT = "core.events.ticket"
+
+
+def publish_event(event_type, data, users=(), author=None):
+    """Отправляет событие пользователям users и подписчикам автора."""
+    event = {"type": event_type, "data": data, "users": list(users)}
+    if author is not None:
+        event["author"] = author
+    payload = json.dumps(event)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    else:
+        # Без Postgres события доходят только до SSE в этом же процессе.
+        hub.publish_local(payload)
+
+
+class Subscription:
+    def __init__(self, user_id, following):
+        self.user_id = user_id
+        self.following = set(following)
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+
+class EventHub:
+    def __init__(self):
+        self.by_user = defaultdict(set)
+        self.by_author = defaultdict(set)
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, user_id, following):
+        self.loop = asyncio.get_running_loop()
+        if connection.vendor == "postgresql" and (
+            self.listener is None or self.listener.done()
+        ):
+            self.listener = self.loop.create_task(self.listen())
+        subscription = Subscription(user_id, following)
+        self.by_user[user_id].add(subscription)
+        for author in subscription.following:
+            self.by_author[author].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.discard(self.by_user, subscription.user_id, subscription)
+        for author in subscription.following:
+            self.discard(self.by_author, author, subscription)
+
+    @staticmethod
+    def discard(index, key, subscription):
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+    def update_following(self, event):
+        author = event["data"]["id"]
+        for user_id in event["users"]:
+            for subscription in self.by_user.get(user_id, ()):
+                if event["data"]["deleted"]:
+                    subscription.following.discard(author)
+                    self.discard(self.by_author, author, subscription)
+                else:
+                    subscription.following.add(author)
+                    self.by_author[author].add(subscription)
+
+    def dispatch(self, payload):
+        event = json.loads(payload)
+        if event["type"] == FOLLOW_EVENT:
+            self.update_following(event)
+        targets = set()
+        for user_id in event["users"]:
+            targets.update(self.by_user.get(user_id, ()))
+        if "author" in event:
+            targets.update(self.by_author.get(event["author"], ()))
+        message = (
+            f"event: {event['type']}\n"
+            f"data: {json.dumps(event['data'])}\n\n"
+        ).encode()
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Медленный клиент пропускает события и догоняет
+                # через /api/sync/.
+                pass
+
+    def publish_local(self, payload):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, payload)
+
+    async def listen(self):
+        while True:
+            try:
+                listen_connection = await sync_to_async(
+                    open_listen_connection, thread_sensitive=False
+                )()
+            except Exception:
+                logger.exception("Не удалось подключиться для LISTEN")
+                await asyncio.sleep(LISTEN_RETRY_SECONDS)
+                continue
+            await self.read_notifications(listen_connection)
+            listen_connection.close()
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    async def read_notifications(self, listen_connection):
+        closed = self.loop.create_future()
+        descriptor = listen_connection.fileno()
+
+        def on_readable():
+            try:
+                listen_connection.poll()
+            except Exception:
+                logger.exception("Соединение LISTEN разорвано")
+                self.loop.remove_reader(descriptor)
+                if not closed.done():
+                    closed.set_result(None)
+                return
+            while listen_connection.notifies:
+                self.dispatch(listen_connection.notifies.pop(0).payload)
+
+        self.loop.add_reader(descriptor, on_readable)
+        await closed
+
+
+def open_listen_connection():
+    wrapper = connections["default"]
+    listen_connection = wrapper.get_new_connection(
+        wrapper.get_connection_params()
+    )
+    listen_connection.autocommit = True
+    with listen_connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    return listen_connection
+
+
+hub = EventHub()
+
+
+def make_ticket(user_id):
+    """Короткоживущий подписанный билет для ?ticket= в /api/events/.
+
+    EventSource в браузере не умеет передавать заголовки, а query string
+    попадает в журналы nginx и uvicorn: вместо постоянного токена там
+    оказывается билет, который через минуту уже бесполезен.
+    """
+    return signing.dumps(user_id, salt=TICKET_SALT)
+
+
+def read_ticket(ticket):
+    try:
+        return signing.loads(
+            ticket, salt=TICKET_SALT, max_age=EVENTS_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+
+
+def get_subscriber(token=None, ticket=None):
+    from rest_framework.authtoken.models import Token
+    from users.models import Follow, User
+
+    close_old_connections()
+    # Как и TokenAuthentication, не пускаем неактивных и удалённых.
+    active = User.objects.filter(is_active=True, deleted_at__isnull=True)
+    if token is not None:
+        user_id = (
+            Token.objects.filter(key=token, user__in=active)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    else:
+        user_id = read_ticket(ticket)
+        if not active.filter(id=user_id).exists():
+            user_id = None
+    if user_id is None:
+        return None, ()
+    following = list(
+        Follow.objects.filter(user_id=user_id).values_list(
+            "author_id", flat=True
+        )
+    )
+    return user_id, following
+
+
+def get_credentials(scope):
+    """Токен из заголовка Authorization или билет из ?ticket=."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            keyword, _, token = value.decode().partition(" ")
+            if keyword == "Token":
+                return {"token": token}
+    query = parse_qs(scope["query_string"].decode())
+    ticket = query.get("ticket", [None])[0]
+    return {"ticket": ticket} if ticket else {}
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def respond(send, status, body=b""):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def events_application(scope, receive, send):
+    """ASGI-приложение для GET /api/events/ (text/event-stream)."""
+    if scope["method"] != "GET":
+        await respond(send, 405)
+        return
+    credentials = get_credentials(scope)
+    user_id, following = (
+        await sync_to_async(get_subscriber)(**credentials)
+        if credentials
+        else (None, ())
+    )
+    if user_id is None:
+        detail = {"detail": "Учетные данные не были предоставлены."}
+        await respond(send, 401, json.dumps(detail).encode())
+        return
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        }
+    )
+    subscription = hub.subscribe(user_id, following)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b": connected\n\n",
+                "more_body": True,
+            }
+        )
+        while True:
+            message = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected},
+                timeout=EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                message.cancel()
+                break
+            if message in done:
+                body = message.result()
+            else:
+                message.cancel()
+                body = b": ping\n\n"
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": True}
+            )
+    except OSError:
+        pass
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryIndex:
+    """Индекс в памяти процесса.
+
+    Первый раз строится синхронно при первом обращении, затем раз в
+    ``ttl`` секунд перестраивается в фоновом потоке: build() собирает
+    новое состояние, не трогая текущее, и install() подменяет его под
+    блокировкой. Пока идёт перестройка, запросы обслуживает старый индекс.
+    Изменения в текущем процессе применяются сразу через инкрементальные
+    методы наследников; те, что пришли во время перестройки, записываются
+    через record() и повторяются поверх нового состояния.
+    """
+
+    ttl = 300
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built_at = None
+        self.rebuild_thread = None
+        self.changes = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def build(self):
+        """Собирает и возвращает новое состояние индекса."""
+        raise NotImplementedError
+
+    def install(self, state):
+        raise NotImplementedError
+
+    def record(self, method, *args):
+        # Вызывается под self.lock из инкрементальных методов.
+        if self.changes is not None:
+            self.changes.append((method, args))
+
+    def ensure_fresh(self):
+        with self.lock:
+            if self.built_at is None:
+                self.install(self.build())
+                self.built_at = time.monotonic()
+            elif time.monotonic() - self.built_at > self.ttl:
+                self.start_rebuild(self.build)
+
+    def start_rebuild(self, build):
+        """Запускает build в фоновом потоке; вызывается под self.lock."""
+        if self.changes is not None:
+            return
+        self.changes = []
+        self.rebuild_thread = threading.Thread(
+            target=self.rebuild, args=(build,), daemon=True
+        )
+        self.rebuild_thread.start()
+
+    def rebuild(self, build):
+        try:
+            state = build()
+        except Exception:
+            logger.exception("Не удалось перестроить %s", type(self).__name__)
+            with self.lock:
+                if threading.current_thread() is not self.rebuild_thread:
+                    return
+                self.changes = None
+                # Следующая попытка — не раньше чем через ttl.
+                self.built_at = time.monotonic()
+            return
+        finally:
+            connections.close_all()
+        with self.lock:
+            # После reset() результат устаревшей перестройки не нужен.
+            if threading.current_thread() is not self.rebuild_thread:
+                return
+            changes, self.changes = self.changes, None
+            self.install(state)
+            for method, args in changes:
+                method(*args)
+            self.built_at = time.monotonic()
+
+    def expire(self):
+        """Перестроить индекс при следующем обращении, не останавливая его."""
+        with self.lock:
+            if self.built_at is not None:
+                self.built_at = time.monotonic() - self.ttl - 1
+
+    def reset(self):
+        with self.lock:
+            self.built_at = None
+            self.changes = None
+            self.rebuild_thread = None
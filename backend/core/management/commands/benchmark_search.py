@@ -0,0 +1,75 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from kitchen.search import RecipeIngredientIndex
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость поиска по индексу ингредиентов на синтетических данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients', type=int, default=2_200)
+        parser.add_argument('--queries', type=int, default=1_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredient_ids = range(1, options['ingredients'] + 1)
+        # Популярность ингредиентов распределена неравномерно, как в жизни.
+        cum_weights = list(
+            itertools.accumulate(1 / rank for rank in ingredient_ids)
+        )
+        rows = {
+            recipe_id: set(
+                rng.choices(
+                    ingredient_ids,
+                    cum_weights=cum_weights,
+                    k=rng.randint(3, 15),
+                )
+            )
+            for recipe_id in range(1, options['recipes'] + 1)
+        }
+
+        index = RecipeIngredientIndex()
+        started = time.perf_counter()
+        index.load(rows)
+        index.built_at = time.monotonic()
+        self.report('Построение индекса', [time.perf_counter() - started])
+
+        sample = rng.sample(sorted(rows), options['queries'])
+        self.report('similar (холодный)', self.measure(
+            lambda recipe_id: index.similar(recipe_id, 6), sample
+        ))
+        self.report('similar (из кэша)', self.measure(
+            lambda recipe_id: index.similar(recipe_id, 6), sample
+        ))
+        pantries = [
+            set(rng.choices(
+                ingredient_ids, cum_weights=cum_weights, k=rng.randint(5, 30)
+            ))
+            for _ in range(options['queries'])
+        ]
+        self.report('find_cookable', self.measure(
+            lambda pantry: index.find_cookable(pantry, 2), pantries
+        ))
+
+    def measure(self, func, arguments):
+        timings = []
+        for argument in arguments:
+            started = time.perf_counter()
+            func(argument)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, title, timings):
+        timings = sorted(timings)
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{title}: медиана {statistics.median(timings) * 1000:.2f} мс, '
+            f'p95 {p95 * 1000:.2f} мс'
+        )
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.fastpath import serialize_recipes, serialize_subscriptions
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer, SubscriptionSerializer
+from kitchen.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность сериализаторов DRF и быстрого пути.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--anonymous', action='store_true')
+
+    def handle(self, *args, **options):
+        request = Request(RequestFactory().get(
+            '/api/recipes/', HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        ))
+        request.user = (
+            AnonymousUser() if options['anonymous'] else User.objects.first()
+        )
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:options['page_size']]
+        )
+        author_ids = list(
+            User.objects.values_list('id', flat=True)[:options['page_size']]
+        )
+        context = {'request': request}
+        cases = (
+            (
+                'recipes',
+                lambda: JSONRenderer().render(RecipeReadSerializer(
+                    Recipe.objects.filter(id__in=recipe_ids),
+                    many=True,
+                    context=context,
+                ).data),
+                lambda: FastJSONRenderer().render(
+                    serialize_recipes(recipe_ids, request)
+                ),
+            ),
+            (
+                'subscriptions',
+                lambda: JSONRenderer().render(SubscriptionSerializer(
+                    User.objects.filter(id__in=author_ids),
+                    many=True,
+                    context=context,
+                ).data),
+                lambda: FastJSONRenderer().render(
+                    serialize_subscriptions(author_ids, request)
+                ),
+            ),
+        )
+        for title, legacy, fast in cases:
+            legacy_rate = self.measure(legacy, options['repeat'])
+            fast_rate = self.measure(fast, options['repeat'])
+            self.stdout.write(
+                f'{title}: DRF {legacy_rate:.0f} стр/с, '
+                f'быстрый путь {fast_rate:.0f} стр/с '
+                f'(x{fast_rate / legacy_rate:.1f})'
+            )
+
+    def measure(self, func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return repeat / (time.perf_counter() - started)
@@ -0,0 +1,47 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет холодный старт: время от запуска нового процесса до '
+        'первого байта ответа, с прогревом и без.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for warm, title in ((False, 'без прогрева'), (True, 'с прогревом')):
+            runs = [
+                self.run_child(options['path'], warm)
+                for _ in range(options['runs'])
+            ]
+            self.stdout.write(f'{title} (статус {runs[0]["status"]}):')
+            for name in runs[0]['timings']:
+                values = [run['timings'][name] for run in runs]
+                self.stdout.write(
+                    f'  {name}: медиана '
+                    f'{statistics.median(values) * 1000:.1f} мс'
+                )
+
+    def run_child(self, path, warm):
+        # Новый интерпретатор: в текущем Django уже загружен.
+        code = (
+            'from core.startup import measure_cold_start; '
+            f'measure_cold_start({path!r}, {warm!r})'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import QueryDict
+from api.filters import RecipeFilter
+from kitchen.models import Favorite, Recipe, RecipeIngredient
+from users.models import User
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = 'Выводит планы запросов фильтров рецептов для сравнения до/после.'
+
+    def handle(self, *args, **options):
+        user = (
+            User.objects.filter(favorites__isnull=False).first()
+            or User.objects.first()
+        )
+        popular = list(
+            RecipeIngredient.objects.values_list('ingredient', flat=True)[:3]
+        )
+        favorite = Favorite.objects.filter(user=user).first()
+        author_id = favorite.recipe.author_id if favorite else user.id
+        cases = {
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+            'ingredients': 'ingredients=' + ','.join(map(str, popular[:2])),
+            'exclude_ingredients': f'exclude_ingredients={popular[-1]}',
+            'cooking_time': 'cooking_time_min=10&cooking_time_max=30',
+            'author': f'author={author_id},{user.id}',
+            'pub_date': 'pub_date_after=2020-01-01T00:00:00',
+        }
+        request = SimpleNamespace(user=user)
+        analyze = connection.vendor == 'postgresql'
+        for title, query in cases.items():
+            queryset = RecipeFilter(
+                QueryDict(query), queryset=Recipe.objects.all(), request=request
+            ).qs[:PAGE_SIZE]
+            options = {'analyze': True, 'buffers': True} if analyze else {}
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{title}: {query}'))
+            self.stdout.write(queryset.explain(**options))
@@ -2,6 +2,7 @@ import json
 import os
 
 from django.core.management.base import BaseCommand
+from kitchen.lookups import invalidate_ingredients
 from kitchen.models import Ingredient
 
 
@@ -36,6 +37,7 @@ class Command(BaseCommand):
         ]
 
         created = Ingredient.objects.bulk_create(ingredients, ignore_conflicts=True)
+        invalidate_ingredients()
         self.stdout.write(self.style.SUCCESS(
             f'Загружено {len(created)} ингредиентов.'
         ))
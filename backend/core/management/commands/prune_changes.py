@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.constants import PURGE_BATCH_SIZE
+from kitchen.sync import prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет записи журнала изменений старше SYNC_RETENTION_DAYS дней.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help='Строк в одной пачке удаления'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {deleted} '
+            f'(хранится {settings.SYNC_RETENTION_DAYS} дн.).'
+        ))
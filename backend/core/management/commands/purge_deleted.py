@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core.constants import PURGE_BATCH_SIZE
+from core.purge import purge_deleted
+from kitchen.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Окончательно удаляет помеченные на удаление рецепты и '
+        'пользователей вместе со связанными строками и файлами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help='Строк в одной пачке удаления'
+        )
+
+    def handle(self, *args, **options):
+        deleted = {}
+        # Рецепты первыми: у удалённого пользователя они уже помечены.
+        for model in (Recipe, User):
+            for label, count in purge_deleted(
+                model, options['batch_size']
+            ).items():
+                deleted[label] = deleted.get(label, 0) + count
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено строк: {sum(deleted.values())}.'
+        ))
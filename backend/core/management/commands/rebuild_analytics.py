@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild
+from core.constants import ANALYTICS_REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает сводки аналитики по всем рецептам. Нужна после '
+        'первого развёртывания и для сверки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=ANALYTICS_REBUILD_BATCH_SIZE,
+            help='Рецептов в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сводки пересобраны по {count} рецептам.'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from kitchen.rankings import refresh_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярности и трендов рецептов.'
+
+    def handle(self, *args, **options):
+        count = refresh_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги обновлены для {count} рецептов.'
+        ))
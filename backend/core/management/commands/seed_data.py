@@ -0,0 +1,120 @@
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from kitchen.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import Follow, User
+
+BATCH_SIZE = 5_000
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для проверки производительности.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--favorites', type=int, default=50, help='На пользователя')
+        parser.add_argument('--carts', type=int, default=5, help='На пользователя')
+        parser.add_argument('--follows', type=int, default=20, help='На пользователя')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты: load_ingredients')
+
+        prefix = uuid.uuid4().hex[:6]
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f'seed_{prefix}_{number}',
+                    email=f'seed_{prefix}_{number}@example.com',
+                    first_name='Seed',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(options['users'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = [user.id for user in users]
+        self.stdout.write(f'Пользователей: {len(user_ids)}')
+
+        # Восемь hex-символов на сотне тысяч рецептов почти наверняка дают
+        # совпадение, поэтому короткие ссылки выбираются без повторов.
+        taken = set(Recipe.all_objects.values_list('short_uuid', flat=True))
+        short_uuids = set()
+        while len(short_uuids) < options['recipes']:
+            short_uuid = uuid.uuid4().hex[:8]
+            if short_uuid not in taken:
+                short_uuids.add(short_uuid)
+        short_uuids = iter(short_uuids)
+
+        recipe_ids = []
+        for start in range(0, options['recipes'], BATCH_SIZE):
+            size = min(BATCH_SIZE, options['recipes'] - start)
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=rng.choice(user_ids),
+                        name=f'Рецепт {start + number}',
+                        image='recipes/images/seed.png',
+                        text='Синтетический рецепт',
+                        cooking_time=rng.randint(1, 240),
+                        short_uuid=next(short_uuids),
+                    )
+                    for number in range(size)
+                )
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+                    for recipe in recipes
+                    for ingredient_id in rng.sample(
+                        ingredient_ids, rng.randint(3, 12)
+                    )
+                )
+            recipe_ids.extend(recipe.id for recipe in recipes)
+        self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+
+        for model, per_user in (
+            (Favorite, options['favorites']),
+            (ShoppingCart, options['carts']),
+        ):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(
+                        recipe_ids, min(per_user, len(recipe_ids))
+                    )
+                ),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in rng.sample(
+                    user_ids, min(options['follows'], len(user_ids))
+                )
+                if author_id != user_id
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        self.stdout.write(self.style.SUCCESS('Готово.'))
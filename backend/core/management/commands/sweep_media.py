@@ -0,0 +1,23 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.storage import CAS_PREFIX, content_storage, release_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы медиа, на которые не ссылается ни одна запись '
+        'и которые не загружали дольше MEDIA_GC_GRACE_SECONDS.'
+    )
+
+    def handle(self, *args, **options):
+        root = content_storage.path(CAS_PREFIX)
+        deleted = 0
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                name = os.path.relpath(
+                    os.path.join(directory, file_name), content_storage.location
+                ).replace(os.sep, '/')
+                deleted += release_file(content_storage, name)
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {deleted}.'))
@@ -0,0 +1,73 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUEST_LATENCY = Histogram(
+    "foodgram_request_duration_seconds",
+    "Время обработки запроса",
+    ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "foodgram_requests",
+    "Количество запросов по статусам ответа",
+    ["route", "method", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "foodgram_requests_in_flight",
+    "Запросы, обрабатываемые в данный момент",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_LATENCY = Histogram(
+    "foodgram_db_query_duration_seconds",
+    "Время выполнения SQL-запросов",
+    ["route"],
+    buckets=QUERY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "foodgram_db_queries_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "foodgram_cache_requests",
+    "Обращения к кэшу (hit/miss)",
+    ["cache", "result"],
+)
+
+
+def record_cache_lookup(cache_name, hit, count=1):
+    CACHE_REQUESTS.labels(cache_name, "hit" if hit else "miss").inc(count)
+
+
+def get_registry():
+    # В gunicorn каждый воркер пишет метрики в свои файлы
+    # в PROMETHEUS_MULTIPROC_DIR, коллектор суммирует их при выдаче.
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
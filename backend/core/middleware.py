@@ -0,0 +1,129 @@
+import time
+
+from django.db import connection
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from core.constants import ANONYMOUS_CACHE_MAX_AGE
+
+from core.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_QUERY_LATENCY,
+    REQUEST_LATENCY,
+    REQUESTS,
+    REQUESTS_IN_FLIGHT,
+)
+from core.profiling import (
+    get_staff_user,
+    is_profiling_requested,
+    profile_request,
+)
+from core.response_cache import (
+    PUBLIC_VIEWS,
+    get_cached_response,
+    is_cacheable_request,
+    store_response,
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def get_route_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.view_name:
+        return UNMATCHED_ROUTE
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов в разрезе маршрутов DRF."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_durations = []
+
+        def observe_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                query_durations.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(observe_query):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        route = get_route_name(request)
+        if getattr(request, "_metrics_in_flight", False):
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+        REQUEST_LATENCY.labels(route, request.method).observe(duration)
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        DB_QUERIES_PER_REQUEST.labels(route).observe(len(query_durations))
+        query_histogram = DB_QUERY_LATENCY.labels(route)
+        for query_duration in query_durations:
+            query_histogram.observe(query_duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        REQUESTS_IN_FLIGHT.labels(get_route_name(request)).inc()
+        request._metrics_in_flight = True
+
+
+class ProfilingMiddleware:
+    """Профилирует запросы сотрудников с заголовком X-Profile или ?profile."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_profiling_requested(request):
+            return self.get_response(request)
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, user)
+
+
+class AnonymousCacheMiddleware:
+    """Отдаёт публичные страницы анонимам из кэша ответов.
+
+    Ответы публичных маршрутов получают Vary: Authorization, Accept;
+    анонимные — Cache-Control: public с коротким max-age для микрокэша
+    nginx, остальные — private.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        if match.view_name not in PUBLIC_VIEWS:
+            return self.get_response(request)
+
+        cacheable = is_cacheable_request(
+            request
+        ) and not is_profiling_requested(request)
+        response = None
+        if cacheable:
+            response = get_cached_response(request)
+            if response is not None:
+                request.resolver_match = match
+                response["X-Cache"] = "HIT"
+        if response is None:
+            response = self.get_response(request)
+            if cacheable and store_response(request, response):
+                response["X-Cache"] = "MISS"
+        patch_vary_headers(response, ("Authorization", "Accept"))
+        if cacheable and "X-Cache" in response:
+            patch_cache_control(
+                response, public=True, max_age=ANONYMOUS_CACHE_MAX_AGE
+            )
+        else:
+            patch_cache_control(response, private=True)
+        return response
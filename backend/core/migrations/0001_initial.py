@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2048, verbose_name='Путь')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Статус')),
+                ('duration', models.FloatField(verbose_name='Время, с')),
+                ('stats', models.TextField(verbose_name='Дерево вызовов')),
+                ('raw_stats', models.BinaryField(verbose_name='Профиль cProfile')),
+                ('queries', models.JSONField(default=list, verbose_name='SQL-запросы')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
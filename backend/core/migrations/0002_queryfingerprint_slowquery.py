@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Нормализованный SQL')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Вызовов')),
+                ('total_duration', models.FloatField(default=0, verbose_name='Всего, мс')),
+                ('max_duration', models.FloatField(default=0, verbose_name='Максимум, мс')),
+                ('last_seen', models.DateTimeField(verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_duration'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('call_site', models.CharField(blank=True, max_length=512, verbose_name='Место вызова')),
+                ('plan', models.TextField(blank=True, verbose_name='План выполнения')),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='core.queryfingerprint', verbose_name='Отпечаток')),
+            ],
+            options={
+                'verbose_name': 'Выполнение медленного запроса',
+                'verbose_name_plural': 'Выполнения медленных запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата создания"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="request_profiles",
+        verbose_name="Пользователь",
+    )
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=2048, verbose_name="Путь")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Статус")
+    duration = models.FloatField(verbose_name="Время, с")
+    stats = models.TextField(verbose_name="Дерево вызовов")
+    raw_stats = models.BinaryField(verbose_name="Профиль cProfile")
+    queries = models.JSONField(default=list, verbose_name="SQL-запросы")
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.created:%Y-%m-%d %H:%M})"
+
+
+class QueryFingerprint(models.Model):
+    fingerprint = models.CharField(
+        max_length=40, unique=True, verbose_name="Отпечаток"
+    )
+    sql = models.TextField(verbose_name="Нормализованный SQL")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Вызовов")
+    total_duration = models.FloatField(default=0, verbose_name="Всего, мс")
+    max_duration = models.FloatField(default=0, verbose_name="Максимум, мс")
+    last_seen = models.DateTimeField(verbose_name="Последний раз")
+
+    class Meta:
+        ordering = ["-total_duration"]
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+
+    def __str__(self):
+        return self.sql[:100]
+
+
+class SlowQuery(models.Model):
+    fingerprint = models.ForeignKey(
+        QueryFingerprint,
+        on_delete=models.CASCADE,
+        related_name="samples",
+        verbose_name="Отпечаток",
+    )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата создания"
+    )
+    sql = models.TextField(verbose_name="SQL")
+    params = models.TextField(blank=True, verbose_name="Параметры")
+    duration = models.FloatField(verbose_name="Время, мс")
+    call_site = models.CharField(
+        max_length=512, blank=True, verbose_name="Место вызова"
+    )
+    plan = models.TextField(blank=True, verbose_name="План выполнения")
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = "Выполнение медленного запроса"
+        verbose_name_plural = "Выполнения медленных запросов"
+
+    def __str__(self):
+        return f"{self.duration:.1f} мс — {self.call_site}"
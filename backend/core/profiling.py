@@ -0,0 +1,77 @@
+import cProfile
+import io
+import marshal
+import pstats
+import time
+
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.models import RequestProfile
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+STATS_LIMIT = 80
+
+
+def is_profiling_requested(request):
+    return PROFILE_HEADER in request.META or PROFILE_QUERY_PARAM in request.GET
+
+
+def get_staff_user(request):
+    user = request.user
+    if not user.is_authenticated:
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if authenticated is None:
+            return None
+        user = authenticated[0]
+    return user if user.is_staff else None
+
+
+def profile_request(request, get_response, user):
+    queries = []
+
+    def capture_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append(
+                {
+                    "sql": sql,
+                    "params": repr(params),
+                    "time": round(time.perf_counter() - started, 6),
+                }
+            )
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with connection.execute_wrapper(capture_query):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LIMIT)
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:2048],
+        status_code=response.status_code,
+        duration=duration,
+        stats=stream.getvalue(),
+        # Тот же формат, что и у pstats.Stats.dump_stats:
+        # файл открывается в snakeviz и других просмотрщиках.
+        raw_stats=marshal.dumps(stats.stats),
+        queries=queries,
+    )
+    response["X-Profile-Id"] = str(profile.pk)
+    return response
@@ -0,0 +1,104 @@
+"""Фоновая очистка строк, помеченных на удаление.
+
+Обычный delete() собирает все каскадно связанные объекты в память и
+удаляет их в одной транзакции запроса, удерживая блокировки. Здесь
+связанные строки удаляются пачками по первичному ключу, каждая пачка —
+отдельный короткий запрос без загрузки моделей и без сигналов. Прерванную
+очистку можно запустить снова: родительская строка удаляется последней.
+"""
+from django.db import models, router, transaction
+
+from core.constants import PURGE_BATCH_SIZE
+from core.storage import release_file, tracked_fields
+
+
+def iter_pk_batches(queryset, batch_size):
+    queryset = queryset.order_by("pk").values_list("pk", flat=True)
+    last_pk = None
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def get_file_names(model, pks):
+    fields = [name for owner, name in tracked_fields if owner is model]
+    if not fields:
+        return []
+    return [
+        (model._meta.get_field(field_name).storage, name)
+        for row in model._base_manager.filter(pk__in=pks).values_list(
+            *fields
+        )
+        for field_name, name in zip(fields, row)
+        if name
+    ]
+
+
+def purge_rows(model, pks, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет строки model с первичными ключами pks и всё зависимое.
+
+    Возвращает число удалённых строк по моделям.
+    """
+    deleted = {}
+    using = router.db_for_write(model)
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        related_model = relation.related_model
+        field_name = relation.field.name
+        related = related_model._base_manager.filter(
+            **{f"{field_name}__in": pks}
+        )
+        on_delete = relation.on_delete
+        if on_delete is models.CASCADE:
+            for related_pks in iter_pk_batches(related, batch_size):
+                for label, count in purge_rows(
+                    related_model, related_pks, batch_size
+                ).items():
+                    deleted[label] = deleted.get(label, 0) + count
+        elif on_delete is models.SET_NULL:
+            for related_pks in iter_pk_batches(related, batch_size):
+                related_model._base_manager.filter(pk__in=related_pks).update(
+                    **{field_name: None}
+                )
+        elif on_delete is not models.DO_NOTHING:
+            raise ValueError(
+                f"Очистка не поддерживает on_delete={on_delete.__name__} "
+                f"для {related_model._meta.label}.{field_name}"
+            )
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        if not through._meta.auto_created:
+            continue
+        links = through._base_manager.filter(
+            **{f"{field.m2m_field_name()}__in": pks}
+        )
+        for link_pks in iter_pk_batches(links, batch_size):
+            through._base_manager.filter(pk__in=link_pks)._raw_delete(using)
+
+    files = get_file_names(model, pks)
+    with transaction.atomic(using=using):
+        count = model._base_manager.filter(pk__in=pks)._raw_delete(using)
+        for storage, name in files:
+            transaction.on_commit(
+                lambda storage=storage, name=name: release_file(storage, name),
+                using=using,
+            )
+    deleted[model._meta.label] = deleted.get(model._meta.label, 0) + count
+    return deleted
+
+
+def purge_deleted(model, batch_size=PURGE_BATCH_SIZE):
+    """Окончательно удаляет строки model с заполненным deleted_at."""
+    deleted = {}
+    queryset = model._base_manager.filter(deleted_at__isnull=False)
+    for pks in iter_pk_batches(queryset, batch_size):
+        for label, count in purge_rows(model, pks, batch_size).items():
+            deleted[label] = deleted.get(label, 0) + count
+    return deleted
@@ -0,0 +1,105 @@
+"""Кэш целых ответов для анонимных GET-запросов к публичным страницам.
+
+Ответ не зависит от посетителя, пока нет заголовка Authorization,
+поэтому ключ строится из схемы, хоста, пути и отсортированных
+параметров запроса. Кэшируется только обычный application/json:
+браузерная версия API и JSON с параметрами (indent) отдаются мимо кэша. Все ключи лежат в одном версионном пространстве
+имён, которое сбрасывается при изменении рецептов, ингредиентов и
+профилей авторов.
+"""
+from urllib.parse import parse_qsl, urlencode
+
+from django.http import HttpResponse
+
+from core.cache import tiered_cache
+from core.constants import ANONYMOUS_CACHE_TIMEOUT
+
+PUBLIC_NAMESPACE = "public"
+PUBLIC_VIEWS = {
+    "recipes-list",
+    "recipes-detail",
+    "ingredients-list",
+    "ingredients-detail",
+    "short-link",
+}
+CACHED_STATUSES = {200, 301, 302}
+STORED_HEADERS = ("Content-Type", "Location")
+PLAIN_JSON = "application/json"
+PLAIN_JSON_RANGES = {"", "*/*", "application/*", PLAIN_JSON}
+
+
+def accepts_plain_json(accept):
+    """Согласование по заголовку Accept даст application/json без параметров."""
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        if media_type not in PLAIN_JSON_RANGES:
+            return False
+        if any(not param.startswith("q=") for param in params):
+            return False
+    return True
+
+
+def is_cacheable_request(request):
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if "HTTP_AUTHORIZATION" in request.META:
+        return False
+    if "format" in request.GET:
+        return False
+    return accepts_plain_json(request.META.get("HTTP_ACCEPT", ""))
+
+
+def get_cache_key(request):
+    params = parse_qsl(
+        request.META.get("QUERY_STRING", ""), keep_blank_values=True
+    )
+    query = urlencode(sorted(params))
+    return (
+        f"response:{request.scheme}://{request.get_host()}"
+        f"{request.path}?{query}"
+    )
+
+
+def get_cached_response(request):
+    key = get_cache_key(request)
+    found = tiered_cache.get_many(
+        [key], namespace=PUBLIC_NAMESPACE, name="anonymous_response"
+    )
+    if key not in found:
+        return None
+    status, headers, content = found[key]
+    response = HttpResponse(content, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def store_response(request, response):
+    if (
+        response.status_code not in CACHED_STATUSES
+        or response.streaming
+        or response.cookies
+        # У ответов DRF — выбранный тип, у редиректов коротких ссылок
+        # тела нет.
+        or getattr(response, "accepted_media_type", PLAIN_JSON) != PLAIN_JSON
+    ):
+        return False
+    headers = {
+        name: response[name] for name in STORED_HEADERS if name in response
+    }
+    tiered_cache.set_many(
+        {
+            get_cache_key(request): (
+                response.status_code,
+                headers,
+                response.content,
+            )
+        },
+        ANONYMOUS_CACHE_TIMEOUT,
+        namespace=PUBLIC_NAMESPACE,
+    )
+    return True
+
+
+def invalidate_public_responses():
+    tiered_cache.bump(PUBLIC_NAMESPACE)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+MAX_PENDING = 100
+MAX_SAMPLES_PER_FINGERPRINT = 20
+CALL_SITE_PACKAGES = ("api", "kitchen", "users")
+EXPLAIN_STATEMENT_TIMEOUT_MS = 10_000
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_local = threading.local()
+
+
+def _reset_after_fork():
+    # gunicorn с preload_app делает fork мастера после прогрева: поток
+    # пула в дочерний процесс не переходит, а блокировка и счётчик
+    # могли быть захвачены в момент fork.
+    global _executor, _executor_lock, _pending
+    _executor = None
+    _executor_lock = threading.Lock()
+    _pending = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def normalize_sql(sql):
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACES_RE.sub(" ", sql).strip()
+
+
+def get_fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+def get_call_site():
+    base_dir = Path(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = Path(frame.f_code.co_filename)
+        if path.is_relative_to(base_dir):
+            relative = path.relative_to(base_dir)
+            if relative.parts[0] in CALL_SITE_PACKAGES:
+                return (
+                    f"{relative.as_posix()}:{frame.f_lineno} "
+                    f"in {frame.f_code.co_name}"
+                )
+        frame = frame.f_back
+    return ""
+
+
+def _suppress_logging():
+    # Запросы самого журнала (EXPLAIN, запись в таблицы) не логируются.
+    _local.suppressed = True
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="slow-query-log",
+                initializer=_suppress_logging,
+            )
+        return _executor
+
+
+def _explain(sql, params):
+    if connection.vendor != "postgresql":
+        return ""
+    statement = sql.lstrip().upper()
+    if not statement.startswith("SELECT") or "FOR UPDATE" in statement:
+        return ""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute(
+                "SET LOCAL statement_timeout = %s",
+                [EXPLAIN_STATEMENT_TIMEOUT_MS],
+            )
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+
+def record_slow_query(sql, params, duration, call_site, with_plan):
+    from core.models import QueryFingerprint, SlowQuery
+
+    normalized = normalize_sql(sql)
+    plan = ""
+    if with_plan:
+        try:
+            plan = _explain(sql, params)
+        except Exception as error:
+            plan = f"EXPLAIN не выполнен: {error}"
+    fingerprint, _ = QueryFingerprint.objects.get_or_create(
+        fingerprint=get_fingerprint(normalized),
+        defaults={"sql": normalized, "last_seen": timezone.now()},
+    )
+    QueryFingerprint.objects.filter(pk=fingerprint.pk).update(
+        calls=F("calls") + 1,
+        total_duration=F("total_duration") + duration,
+        max_duration=Greatest("max_duration", duration),
+        last_seen=timezone.now(),
+    )
+    SlowQuery.objects.create(
+        fingerprint=fingerprint,
+        sql=sql,
+        params=repr(params),
+        duration=duration,
+        call_site=call_site,
+        plan=plan,
+    )
+    stale_ids = fingerprint.samples.values_list("pk", flat=True)[
+        MAX_SAMPLES_PER_FINGERPRINT:
+    ]
+    SlowQuery.objects.filter(pk__in=list(stale_ids)).delete()
+
+
+def _record_in_background(*args):
+    global _pending
+    close_old_connections()
+    try:
+        record_slow_query(*args)
+    finally:
+        with _executor_lock:
+            _pending -= 1
+
+
+def log_slow_query(execute, sql, params, many, context):
+    if getattr(_local, "suppressed", False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            _submit(sql, params, many, duration)
+
+
+def _submit(sql, params, many, duration):
+    global _pending
+    executor = _get_executor()
+    with _executor_lock:
+        if _pending >= MAX_PENDING:
+            return
+        _pending += 1
+    with_plan = (
+        not many
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+    )
+    executor.submit(
+        _record_in_background,
+        sql,
+        None if many else params,
+        duration,
+        get_call_site(),
+        with_plan,
+    )
+
+
+def install_slow_query_logger(sender, connection, **kwargs):
+    # Вставляем в начало списка: execute_wrapper() снимает последний
+    # элемент, и соединение может открыться внутри такого блока.
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_query)
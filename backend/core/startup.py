@@ -0,0 +1,175 @@
+"""Замеры запуска и прогрев процесса.
+
+Без прогрева первый запрос каждого воркера оплачивает компиляцию
+URL-шаблонов, построение полей сериализаторов DRF, импорт djoser и
+холодные выборки ингредиентов. gunicorn загружает приложение в мастере
+(preload_app) и вызывает warm_up() до запуска воркеров, так что воркеры
+получают всё это готовым после fork. Модуль импортируется до
+django.setup(), поэтому Django подключается внутри функций.
+
+Если база данных недоступна или не мигрирована, процесс стартует без
+прогрева данных, а /ready отвечает 503 и повторяет прогрев не чаще
+раза в WARM_UP_RETRY_SECONDS.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Запросы, для которых при прогреве разбираются URL.
+WARM_UP_PATHS = (
+    "/api/recipes/",
+    "/api/recipes/1/",
+    "/api/recipes/download_shopping_cart/",
+    "/api/ingredients/",
+    "/api/users/",
+    "/api/users/me/",
+    "/api/users/subscriptions/",
+    "/s/abc/",
+)
+
+WARM_UP_RETRY_SECONDS = 5
+
+timings = {}
+state = {"ready": False, "retried_at": None}
+retry_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+        logger.info("Запуск: %s за %.3f с", name, timings[name])
+
+
+def warm_urls():
+    from django.urls import get_resolver, resolve, reverse
+
+    # Первый reverse() заполняет словари резолвера, resolve() компилирует
+    # регулярные выражения шаблонов по пути запроса.
+    get_resolver()
+    reverse("recipes-list")
+    for path in WARM_UP_PATHS:
+        resolve(path)
+
+
+def warm_serializers():
+    from api import serializers
+
+    for serializer_class in (
+        serializers.RecipeReadSerializer,
+        serializers.RecipeWriteSerializer,
+        serializers.IngredientSerializer,
+        serializers.UserSerializer,
+        serializers.UserCreateSerializer,
+        serializers.SubscriptionSerializer,
+        serializers.RecipeActionSerializer,
+        serializers.FollowCreateSerializer,
+        serializers.SetPasswordSerializer,
+        serializers.PantryQuerySerializer,
+    ):
+        serializer_class(context={}).fields
+
+
+def warm_ingredients():
+    from kitchen.lookups import get_ingredient_rows
+
+    get_ingredient_rows("")
+
+
+def warm_indexes():
+    from kitchen.search import recipe_index
+    from kitchen.suggestions import follow_graph
+
+    recipe_index.ensure_fresh()
+    follow_graph.ensure_fresh()
+
+
+def warm_data():
+    """Прогрев, которому нужны база данных и общий кэш."""
+    try:
+        with phase("ingredients"):
+            warm_ingredients()
+        with phase("indexes"):
+            warm_indexes()
+    except Exception:
+        logger.exception("Прогрев данных не удался, процесс стартует холодным")
+        return False
+    state["ready"] = True
+    return True
+
+
+def warm_up():
+    """Прогревает процесс и отмечает его готовым к приёму запросов."""
+    from django.db import connections
+
+    with phase("warm_up"):
+        with phase("urls"):
+            warm_urls()
+        with phase("serializers"):
+            warm_serializers()
+        warm_data()
+    # Соединение, открытое в мастере gunicorn, не должно достаться
+    # воркерам после fork.
+    connections.close_all()
+    return state["ready"]
+
+
+def retry_warm_up():
+    """Повторяет прогрев данных, если он ещё не удался; для /ready."""
+    if state["ready"]:
+        return True
+    if not retry_lock.acquire(blocking=False):
+        return False
+    try:
+        now = time.monotonic()
+        retried_at = state["retried_at"]
+        if retried_at is not None and now - retried_at < WARM_UP_RETRY_SECONDS:
+            return False
+        state["retried_at"] = now
+        return warm_data()
+    finally:
+        retry_lock.release()
+
+
+def measure_cold_start(path, warm):
+    """Время от старта интерпретатора до первого байта ответа.
+
+    Запускается в отдельном процессе командой benchmark_startup и
+    печатает замеры в JSON.
+    """
+    import io
+    import sys
+
+    started = time.perf_counter()
+    with phase("import"):
+        from foodgram.wsgi import application
+    if warm:
+        warm_up()
+
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+    }
+    statuses = []
+    with phase("first_byte"):
+        response = application(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        next(iter(response), b"")
+    response.close()
+    timings["total"] = time.perf_counter() - started
+    print(json.dumps({"status": statuses[0], "timings": timings}))
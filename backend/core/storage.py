@@ -0,0 +1,153 @@
+"""Хранилище медиа с адресацией по содержимому.
+
+Файл называется по SHA-256 содержимого (cas/ab/<sha256>.<ext>), поэтому
+одинаковые загрузки хранятся один раз, а по неизменяемому URL можно
+отдавать Cache-Control: immutable. Счётчик ссылок не хранится: файл
+удаляется, когда после фиксации транзакции на него не ссылается ни одно
+поле из track_file_field().
+
+Загрузка и удаление одного файла идут под блокировкой по имени
+(advisory lock в Postgres). Повторная загрузка обновляет время изменения
+файла, а удаляются только файлы, которые не загружали дольше
+MEDIA_GC_GRACE_SECONDS: строка, ссылающаяся на только что загруженный
+файл, может быть ещё не зафиксирована. Такие файлы позже удаляет
+sweep_media.
+"""
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.constants import MEDIA_GC_GRACE_SECONDS
+
+CAS_PREFIX = "cas"
+
+tracked_fields = []
+local_lock = threading.Lock()
+
+
+@contextmanager
+def content_lock(name):
+    if connection.vendor != "postgresql":
+        with local_lock:
+            yield
+        return
+    key = int(hashlib.sha256(name.encode()).hexdigest()[:15], 16)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [key])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = pathlib.PurePath(name).suffix.lower()
+        return f"{CAS_PREFIX}/{digest[:2]}/{digest}{extension}"
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        with content_lock(name):
+            if self.exists(name):
+                os.utime(self.path(name))
+            else:
+                self.write(name, content)
+        return name
+
+    def write(self, name, content):
+        # Запись во временный файл и переименование поверх: одновременная
+        # первая загрузка того же содержимого не получает имя с суффиксом.
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+content_storage = ContentAddressedStorage()
+
+
+def is_referenced(name):
+    return any(
+        model._base_manager.filter(**{field_name: name}).exists()
+        for model, field_name in tracked_fields
+    )
+
+
+def release_file(storage, name):
+    """Удаляет файл, если на него не ссылаются и его давно не загружали."""
+    if not name:
+        return False
+    with content_lock(name):
+        try:
+            modified = os.path.getmtime(storage.path(name))
+        except FileNotFoundError:
+            return False
+        if time.time() - modified < MEDIA_GC_GRACE_SECONDS:
+            return False
+        if is_referenced(name):
+            return False
+        storage.delete(name)
+    return True
+
+
+def track_file_field(model, field_name):
+    """Удаляет файлы поля, на которые больше никто не ссылается."""
+    tracked_fields.append((model, field_name))
+    storage = model._meta.get_field(field_name).storage
+    replaced_attr = f"_replaced_{field_name}"
+
+    def remember_replaced(sender, instance, update_fields=None, **kwargs):
+        if instance.pk is None or (
+            update_fields is not None and field_name not in update_fields
+        ):
+            return
+        old_name = (
+            sender._default_manager.filter(pk=instance.pk)
+            .values_list(field_name, flat=True)
+            .first()
+        )
+        if old_name and old_name != getattr(instance, field_name).name:
+            setattr(instance, replaced_attr, old_name)
+
+    def release_replaced(sender, instance, **kwargs):
+        old_name = instance.__dict__.pop(replaced_attr, None)
+        if old_name:
+            transaction.on_commit(lambda: release_file(storage, old_name))
+
+    def release_deleted(sender, instance, **kwargs):
+        name = getattr(instance, field_name).name
+        if name:
+            transaction.on_commit(lambda: release_file(storage, name))
+
+    pre_save.connect(remember_replaced, sender=model, weak=False)
+    post_save.connect(release_replaced, sender=model, weak=False)
+    post_delete.connect(release_deleted, sender=model, weak=False)
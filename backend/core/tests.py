@@ -0,0 +1,590 @@
+import asyncio
+import csv
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.admin_utils import EstimatedCountPaginator
+from core.cache import TieredCache
+from core.events import (
+    events_application,
+    get_subscriber,
+    hub,
+    make_ticket,
+)
+from core.indexes import InMemoryIndex
+from core.models import QueryFingerprint, RequestProfile
+from core import slow_queries
+from core.slow_queries import normalize_sql, record_slow_query
+from core.startup import state, warm_up
+from kitchen.lookups import get_recipe_ingredients
+from kitchen.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import Follow, User
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_metrics_are_labeled_by_route(self):
+        self.client.get(reverse("recipes-list"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('route="recipes-list"', content)
+        self.assertIn("foodgram_db_query_duration_seconds", content)
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username="staff",
+            email="staff@example.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.user = User.objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="testpass123",
+        )
+
+    def test_staff_request_with_flag_is_profiled(self):
+        token = Token.objects.create(user=self.staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(
+            reverse("recipes-list"), {"profile": "1"}
+        )
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.pk))
+        self.assertEqual(profile.user, self.staff)
+        self.assertTrue(profile.queries)
+
+    def test_regular_user_request_is_not_profiled(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.client.get(reverse("recipes-list"), HTTP_X_PROFILE="1")
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+class SlowQueryLogTestCase(TestCase):
+    def test_queries_differing_by_literals_share_fingerprint(self):
+        first = normalize_sql(
+            'SELECT * FROM "kitchen_recipe" WHERE "id" IN (%s, %s) LIMIT 6'
+        )
+        second = normalize_sql(
+            'SELECT *  FROM "kitchen_recipe" WHERE "id" IN (%s) LIMIT 21'
+        )
+        self.assertEqual(first, second)
+
+    def test_record_groups_samples_by_fingerprint(self):
+        for duration in (300, 500):
+            record_slow_query(
+                'SELECT 1 FROM "kitchen_recipe" LIMIT %s' % duration,
+                None,
+                duration,
+                "api/views.py:1 in list",
+                with_plan=False,
+            )
+        fingerprint = QueryFingerprint.objects.get()
+        self.assertEqual(fingerprint.calls, 2)
+        self.assertEqual(fingerprint.max_duration, 500)
+        self.assertEqual(fingerprint.samples.count(), 2)
+
+    def test_forked_worker_gets_fresh_background_logger(self):
+        pending = slow_queries._pending
+        # Так выглядит мастер gunicorn, если fork пришёлся на запись.
+        with slow_queries._executor_lock:
+            slow_queries._pending = slow_queries.MAX_PENDING
+            pid = os.fork()
+            if pid == 0:
+                fresh = (
+                    slow_queries._executor is None
+                    and slow_queries._pending == 0
+                    and slow_queries._executor_lock.acquire(blocking=False)
+                )
+                os._exit(0 if fresh else 1)
+            slow_queries._pending = pending
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+class AdminPerformanceTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="testpass123",
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="секретный ингредиент", measurement_unit="г"
+        )
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            number = User.objects.count()
+            user = User.objects.create_user(
+                username=f"user{number}",
+                email=f"user{number}@example.com",
+                password="testpass123",
+            )
+            recipe = Recipe.objects.create(
+                author=user,
+                name=f"Рецепт {number}",
+                image="recipes/images/test.png",
+                text="Описание",
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=1
+            )
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            Follow.objects.create(user=self.admin, author=user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ("recipe", "favorite", "shoppingcart"):
+            url = reverse(f"admin:kitchen_{model}_changelist")
+            with self.subTest(model=model):
+                self.add_rows(2)
+                before = self.count_queries(url)
+                self.add_rows(3)
+                self.assertEqual(self.count_queries(url), before)
+        url = reverse("admin:users_follow_changelist")
+        before = self.count_queries(url)
+        self.add_rows(3)
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_soft_deleted_list_uses_estimated_count(self):
+        self.add_rows(2)
+        Recipe.objects.filter(name="Рецепт 1").update(deleted_at=timezone.now())
+        with patch.object(connection, "vendor", "postgresql"), patch(
+            "core.admin_utils.get_estimated_count", return_value=10**6
+        ):
+            self.assertEqual(
+                EstimatedCountPaginator(Recipe.objects.all(), 10).count,
+                10**6 - 1,
+            )
+            self.assertEqual(
+                EstimatedCountPaginator(
+                    Recipe.objects.filter(cooking_time=10), 10
+                ).count,
+                1,
+            )
+
+    def test_recipe_page_does_not_render_ingredient_choices(self):
+        self.add_rows(1)
+        unused = Ingredient.objects.create(
+            name="лишний ингредиент", measurement_unit="г"
+        )
+        response = self.client.get(
+            reverse(
+                "admin:kitchen_recipe_change",
+                args=[Recipe.objects.get().pk],
+            )
+        )
+        self.assertContains(response, "В избранном")
+        self.assertNotContains(response, unused.name)
+
+    def test_prefix_search(self):
+        self.add_rows(2)
+        response = self.client.get(
+            reverse("admin:kitchen_recipe_changelist"), {"q": "USER1"}
+        )
+        self.assertEqual(
+            [recipe.name for recipe in response.context["cl"].result_list],
+            ["Рецепт 1"],
+        )
+
+    def test_csv_export_streams_filtered_rows(self):
+        self.add_rows(3)
+        author = User.objects.get(username="user2")
+        response = self.client.get(
+            reverse("admin:kitchen_recipe_export"),
+            {"author__id__exact": author.pk},
+        )
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(
+            b"".join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], "user2")
+        self.assertEqual(rows[1][5:], ["секретный ингредиент", "г", "1"])
+
+        response = self.client.post(
+            reverse("admin:users_user_changelist"),
+            {
+                "action": "export_csv",
+                "_selected_action": [author.pk],
+            },
+        )
+        rows = list(csv.reader(
+            b"".join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual([row[1] for row in rows], ["username", "user2"])
+
+    def test_csv_export_escapes_formulas(self):
+        self.add_rows(1)
+        Recipe.objects.update(name="=HYPERLINK(\"http://example.com\")")
+        response = self.client.get(reverse("admin:kitchen_recipe_export"))
+        rows = list(csv.reader(
+            b"".join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertIn("'=HYPERLINK(\"http://example.com\")", rows[1])
+
+
+class EventsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="testpass123",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.token = Token.objects.create(user=self.user)
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author,
+            name="Рецепт",
+            image="recipes/images/test.png",
+            text="Описание",
+            cooking_time=10,
+        )
+
+    async def test_events_are_pushed_to_subscriber(self):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/events/",
+            "headers": [(b"authorization", f"Token {self.token}".encode())],
+            "query_string": b"",
+        }
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        connection = asyncio.ensure_future(
+            events_application(scope, receive, sent.put)
+        )
+        self.assertEqual((await sent.get())["status"], 200)
+        self.assertEqual((await sent.get())["body"], b": connected\n\n")
+
+        recipe = await sync_to_async(self.create_recipe)()
+        message = await asyncio.wait_for(sent.get(), timeout=5)
+        self.assertTrue(message["body"].startswith(b"event: recipe\n"))
+
+        await sync_to_async(ShoppingCart.objects.create)(
+            user=self.user, recipe=recipe
+        )
+        message = await asyncio.wait_for(sent.get(), timeout=5)
+        self.assertEqual(
+            message["body"],
+            b"event: shopping_cart\n"
+            + f'data: {{"id": {recipe.id}, "deleted": false}}\n\n'.encode(),
+        )
+
+        disconnected.set()
+        await connection
+        self.assertFalse(hub.by_user)
+        self.assertFalse(hub.by_author)
+
+    async def connect(self, query_string):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/events/",
+            "headers": [],
+            "query_string": query_string.encode(),
+        }
+        sent = asyncio.Queue()
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        await events_application(scope, receive, sent.put)
+        return (await sent.get())["status"]
+
+    async def test_query_string_accepts_ticket_not_token(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = await sync_to_async(client.post)(reverse("events-ticket"))
+        ticket = response.data["ticket"]
+
+        self.assertEqual(await self.connect(f"ticket={ticket}"), 200)
+        self.assertEqual(await self.connect(f"token={self.token}"), 401)
+        with patch("core.events.EVENTS_TICKET_MAX_AGE", -1):
+            self.assertEqual(await self.connect(f"ticket={ticket}"), 401)
+
+    def test_inactive_and_deleted_users_cannot_subscribe(self):
+        ticket = make_ticket(self.user.id)
+        self.assertEqual(get_subscriber(token=self.token.key)[0], self.user.id)
+        for changes in (
+            {"is_active": False},
+            {"is_active": True, "deleted_at": timezone.now()},
+        ):
+            User.objects.filter(id=self.user.id).update(**changes)
+            self.assertEqual(get_subscriber(token=self.token.key), (None, ()))
+            self.assertEqual(get_subscriber(ticket=ticket), (None, ()))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+)
+class TieredCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache = TieredCache()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def get(self):
+        return self.cache.get_or_set("key", self.compute, 60, "space")
+
+    def test_values_are_computed_once_per_namespace_version(self):
+        self.assertEqual([self.get() for _ in range(3)], [1, 1, 1])
+        self.cache.local.clear()
+        self.assertEqual(self.get(), 1)
+        self.cache.bump("space")
+        self.assertEqual(self.get(), 2)
+
+    def test_locked_key_serves_stale_value(self):
+        self.cache.get_or_set("key", self.compute, 60)
+        self.cache.local.clear()
+        self.cache.shared.add("lock:key", 1)
+        value, _, delta = self.cache.shared.get("key")
+        # Истёкшая запись пересчитывается, но ключ занят другим процессом.
+        self.cache.shared.set("key", (value, 0, delta))
+        self.assertEqual(self.cache.get_or_set("key", self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_ingredient_list_is_invalidated_on_write(self):
+        client = APIClient()
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        response = client.get(reverse("ingredients-list"), {"name": "с"})
+        self.assertEqual(len(response.data), 1)
+        Ingredient.objects.create(name="сахар", measurement_unit="г")
+        response = client.get(reverse("ingredients-list"), {"name": "с"})
+        self.assertEqual(len(response.data), 2)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse("ingredients-list"), {"name": "с"})
+        self.assertEqual(len(queries), 0)
+
+    def test_recipe_fragments_follow_ingredient_renames(self):
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        ingredient = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        recipe = Recipe.objects.create(
+            author=author,
+            name="Рецепт",
+            image="recipes/images/test.png",
+            text="Описание",
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        versions = {recipe.id: recipe.updated_at}
+        self.assertEqual(
+            get_recipe_ingredients(versions)[recipe.id][0]["name"], "соль"
+        )
+        ingredient.name = "соль морская"
+        ingredient.save()
+        self.assertEqual(
+            get_recipe_ingredients(versions)[recipe.id][0]["name"],
+            "соль морская",
+        )
+
+
+class AnonymousCacheTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author,
+            name=name,
+            image="recipes/images/test.png",
+            text="Описание",
+            cooking_time=10,
+        )
+
+    def test_anonymous_responses_are_cached_until_recipe_write(self):
+        self.create_recipe("Первый")
+        url = reverse("recipes-list")
+        first = self.client.get(url, {"limit": 5, "page": 1})
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertIn("public", first["Cache-Control"])
+        self.assertIn("Authorization", first["Vary"])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, {"page": 1, "limit": 5})
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.content, first.content)
+
+        self.create_recipe("Второй")
+        third = self.client.get(url, {"limit": 5, "page": 1})
+        self.assertEqual(third["X-Cache"], "MISS")
+        self.assertEqual(third.json()["count"], 2)
+
+    def test_only_plain_json_is_shared(self):
+        self.create_recipe("Первый")
+        url = reverse("recipes-list")
+        for accept in ("application/json; indent=4", "text/html"):
+            response = self.client.get(url, HTTP_ACCEPT=accept)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("X-Cache", response)
+
+        first = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(first["X-Cache"], "MISS")
+        second = self.client.get(url, HTTP_ACCEPT="*/*")
+        self.assertEqual(second["X-Cache"], "HIT")
+        indented = self.client.get(
+            url, HTTP_ACCEPT="application/json; indent=4"
+        )
+        self.assertNotIn("X-Cache", indented)
+        self.assertNotEqual(indented.content, first.content)
+
+    def test_authenticated_responses_are_private(self):
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(reverse("recipes-list"))
+        self.assertNotIn("X-Cache", response)
+        self.assertIn("private", response["Cache-Control"])
+
+
+class SetIndex(InMemoryIndex):
+    ttl = 0
+
+    def __init__(self):
+        super().__init__()
+        self.source = {1}
+        self.release = threading.Event()
+        self.release.set()
+
+    def build(self):
+        snapshot = set(self.source)
+        self.release.wait(5)
+        return snapshot
+
+    def install(self, state):
+        self.items = state
+
+    def add(self, item):
+        with self.lock:
+            self.record(self.add, item)
+            self.items.add(item)
+
+
+class InMemoryIndexTestCase(SimpleTestCase):
+    def test_rebuild_runs_in_background_and_keeps_changes(self):
+        index = SetIndex()
+        index.ensure_fresh()
+        self.assertEqual(index.items, {1})
+
+        index.source = {1, 2}
+        index.release.clear()
+        index.ensure_fresh()
+        # Пока идёт перестройка, работает старый индекс.
+        self.assertEqual(index.items, {1})
+        index.add(3)
+        self.assertEqual(index.items, {1, 3})
+
+        index.release.set()
+        index.rebuild_thread.join(5)
+        self.assertEqual(index.items, {1, 2, 3})
+
+
+class StartupTestCase(TransactionTestCase):
+    # warm_up() закрывает соединения, что недопустимо внутри транзакции
+    # TestCase.
+    def setUp(self):
+        state["ready"] = False
+        state["retried_at"] = None
+
+    def tearDown(self):
+        state["ready"] = False
+        state["retried_at"] = None
+
+    def test_cold_start_without_database_retries_on_ready(self):
+        with patch(
+            "core.startup.warm_ingredients",
+            side_effect=OperationalError("база недоступна"),
+        ):
+            self.assertFalse(warm_up())
+            response = self.client.get(reverse("ready"))
+            self.assertEqual(response.status_code, 503)
+
+        # Следующая попытка — не раньше чем через WARM_UP_RETRY_SECONDS.
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 503)
+        state["retried_at"] = None
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_ready_after_warm_up(self):
+        # Повторный прогрев из /ready только что был.
+        state["retried_at"] = time.monotonic()
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 503)
+
+        warm_up()
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["ready"])
+        self.assertLessEqual(
+            {"urls", "indexes", "warm_up"}, set(response.json()["timings"])
+        )
@@ -0,0 +1,31 @@
+from http import HTTPStatus
+
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
+
+from core.metrics import render_metrics
+from core.startup import retry_warm_up, timings
+
+
+def metrics(request):
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
+
+def ready(request):
+    # Процесс готов, когда прогрет и видит базу данных.
+    is_ready = retry_warm_up()
+    if is_ready:
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            is_ready = False
+    return JsonResponse(
+        {
+            "ready": is_ready,
+            "timings": {
+                name: round(value, 3) for name, value in timings.items()
+            },
+        },
+        status=HTTPStatus.OK if is_ready else HTTPStatus.SERVICE_UNAVAILABLE,
+    )
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core.events import events_application  # noqa: E402
+
+EVENTS_PATH = "/api/events/"
+
+
+async def application(scope, receive, send):
+    # SSE обслуживается отдельно от Django: долгие соединения не занимают
+    # потоки и не проходят через middleware.
+    if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        await events_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
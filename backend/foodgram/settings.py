@@ -47,15 +47,19 @@ INSTALLED_APPS = [
     "kitchen",
     "core",
     "users",
+    "analytics",
     "api",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "core.middleware.AnonymousCacheMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -94,6 +98,39 @@ DATABASES = {
     }
 }
 
+# Общий кэш воркеров. В продакшене Redis: атомарный add() нужен
+# блокировкам core/cache.py. Файловый кэш без REDIS_URL — для тестов
+# и локального запуска.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_LOCATION", "/tmp/foodgram_cache"),
+            "OPTIONS": {"MAX_ENTRIES": 100_000},
+        }
+    }
+
+# Запросы дольше порога (мс) попадают в журнал медленных запросов,
+# для доли из них в фоне снимается EXPLAIN (ANALYZE, BUFFERS).
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1")
+)
+
+# Журнал изменений отдаётся с задержкой, чтобы транзакции, начатые раньше,
+# успели зафиксироваться (см. kitchen.sync.get_changes).
+SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", "2"))
+# Сколько дней хранится журнал изменений; клиенту с более старым токеном
+# /api/sync/ велит загрузить данные заново.
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +161,10 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend"
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "api.pagination.LimitPageNumberPagination",
     "PAGE_SIZE": 6,
 }
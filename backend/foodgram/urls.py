@@ -18,9 +18,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from api.views import redirect_short_link
+from core.views import metrics, ready
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/', include('api.urls')),
     path("s/<slug:slug>/", redirect_short_link, name="short-link"),
+    path("metrics", metrics, name="metrics"),
+    path("ready", ready, name="ready"),
 ]
@@ -0,0 +1,37 @@
+import os
+import shutil
+
+bind = "0.0.0.0:8000"
+# Потоковые выгрузки CSV длятся дольше timeout: в gthread-воркере
+# heartbeat мастеру идёт из основного цикла, пока потоки отдают ответ.
+worker_class = "gthread"
+threads = 4
+# Приложение загружается и прогревается в мастере один раз, воркеры
+# получают его готовым после fork.
+preload_app = True
+
+
+def on_starting(server):
+    # Файлы метрик от предыдущего запуска искажают счётчики.
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    # Вызывается в мастере до запуска воркеров.
+    from core.startup import timings, warm_up
+
+    warm_up()
+    server.log.info(
+        "Прогрев: %s",
+        ", ".join(f"{name} {value:.3f} с" for name, value in timings.items()),
+    )
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
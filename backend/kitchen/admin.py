@@ -1,4 +1,14 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from core.admin_utils import (
+    CsvExportMixin,
+    LargeTableAdmin,
+    PrefixSearchMixin,
+    SoftDeleteMixin,
+)
+from kitchen.deletion import soft_delete_recipes
+from kitchen.signals import recipe_saved
 from kitchen.models import (
     Ingredient,
     Recipe,
@@ -9,7 +19,7 @@ from kitchen.models import (
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ("name", "measurement_unit")
     search_fields = ("name",)
 
@@ -17,28 +27,83 @@ class IngredientAdmin(admin.ModelAdmin):
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ("ingredient",)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(
+    SoftDeleteMixin, CsvExportMixin, LargeTableAdmin, admin.ModelAdmin
+):
+    soft_delete = staticmethod(soft_delete_recipes)
     list_display = ("name", "author", "get_favorites_count")
+    csv_fields = (
+        "id",
+        "name",
+        "author__username",
+        "cooking_time",
+        "pub_date",
+        "recipe_ingredients__ingredient__name",
+        "recipe_ingredients__ingredient__measurement_unit",
+        "recipe_ingredients__amount",
+    )
+    list_select_related = ("author",)
     search_fields = ("name", "author__username")
     readonly_fields = ("get_favorites_count",)
+    autocomplete_fields = ("author",)
     inlines = [RecipeIngredientInline]
 
-    def get_favorites_count(self, obj):
-        return obj.favorited_by.count()
+    def get_queryset(self, request):
+        # Коррелированный подзапрос считается только для строк страницы,
+        # а JOIN с GROUP BY агрегировал бы всю таблицу избранного.
+        favorites_count = (
+            Favorite.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                favorites_count=Coalesce(
+                    Subquery(favorites_count, output_field=IntegerField()), 0
+                )
+            )
+        )
 
-    get_favorites_count.short_description = "В избранном"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Индекс поиска, кэши и сводки обновляются так же, как из API.
+        recipe = form.instance
+        recipe_saved.send(
+            sender=Recipe,
+            recipe=recipe,
+            ingredient_ids=list(
+                recipe.recipe_ingredients.values_list(
+                    "ingredient_id", flat=True
+                )
+            ),
+        )
+
+    @admin.display(description="В избранном", ordering="favorites_count")
+    def get_favorites_count(self, obj):
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(CsvExportMixin, LargeTableAdmin, admin.ModelAdmin):
     list_display = ("user", "recipe")
+    csv_fields = ("user__username", "recipe_id", "recipe__name", "created")
+    list_select_related = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
+    autocomplete_fields = ("user", "recipe")
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(CsvExportMixin, LargeTableAdmin, admin.ModelAdmin):
     list_display = ("user", "recipe")
+    csv_fields = ("user__username", "recipe_id", "recipe__name", "created")
+    list_select_related = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
+    autocomplete_fields = ("user", "recipe")
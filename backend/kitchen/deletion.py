@@ -0,0 +1,53 @@
+"""Мягкое удаление рецептов и пользователей.
+
+Строки только помечаются deleted_at и сразу пропадают из выдачи, а сами
+данные вместе с зависимыми таблицами и файлами удаляет команда
+purge_deleted пачками вне запроса (см. core/purge.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.response_cache import invalidate_public_responses
+from kitchen.models import Recipe
+from kitchen.signals import recipes_hidden
+from users.models import User
+
+
+def soft_delete_recipes(queryset):
+    rows = list(
+        queryset.filter(deleted_at__isnull=True).values_list(
+            "id", "short_uuid"
+        )
+    )
+    if not rows:
+        return 0
+    recipe_ids = [recipe_id for recipe_id, _ in rows]
+    Recipe.all_objects.filter(id__in=recipe_ids).update(
+        deleted_at=timezone.now()
+    )
+    transaction.on_commit(
+        lambda: recipes_hidden.send(
+            sender=Recipe,
+            recipe_ids=recipe_ids,
+            short_links=[short_uuid for _, short_uuid in rows],
+        )
+    )
+    return len(rows)
+
+
+def soft_delete_users(queryset):
+    user_ids = list(
+        queryset.filter(deleted_at__isnull=True).values_list("id", flat=True)
+    )
+    if not user_ids:
+        return 0
+    with transaction.atomic():
+        # Неактивного пользователя не пустят ни вход, ни проверка токена.
+        User.objects.filter(id__in=user_ids).update(
+            deleted_at=timezone.now(), is_active=False
+        )
+        Token.objects.filter(user_id__in=user_ids).delete()
+        soft_delete_recipes(Recipe.objects.filter(author_id__in=user_ids))
+    transaction.on_commit(invalidate_public_responses)
+    return len(user_ids)
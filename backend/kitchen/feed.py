@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models import Q
+
+from core.constants import FEED_BACKFILL_RECIPES, FEED_FANOUT_MAX_FOLLOWERS
+from kitchen.models import FanOutOnReadAuthor, FeedEntry, Recipe
+from users.models import Follow
+
+FANOUT_BATCH_SIZE = 1_000
+
+
+def is_fan_out_on_read(author):
+    # Решение хранится в базе: запись и чтение ленты видят его одинаково.
+    return FanOutOnReadAuthor.objects.filter(author=author).exists()
+
+
+def write_entries(follower_ids, recipes):
+    batch = []
+    for follower_id in follower_ids:
+        for recipe_id, pub_date in recipes:
+            batch.append(
+                FeedEntry(
+                    user_id=follower_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+            )
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def get_follower_ids(author_id):
+    return (
+        Follow.objects.filter(author_id=author_id)
+        .values_list("user", flat=True)
+        .order_by()
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+
+
+def fan_out_recipe(recipe):
+    if is_fan_out_on_read(recipe.author):
+        return
+    write_entries(
+        get_follower_ids(recipe.author_id), [(recipe.id, recipe.pub_date)]
+    )
+
+
+def backfill_feed(user, author):
+    # Записи пишутся и для авторов с лентой при чтении: если автор выйдет
+    # из этого режима, досылать придётся только рецепты за время в нём.
+    recipes = Recipe.objects.filter(author=author).values_list(
+        "id", "pub_date"
+    )[:FEED_BACKFILL_RECIPES]
+    write_entries([user.id], recipes)
+    update_fan_out_mode(author)
+
+
+def prune_feed(user, author):
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
+    update_fan_out_mode(author)
+
+
+def update_fan_out_mode(author):
+    """Переключает автора между раскладкой при записи и при чтении."""
+    followers = Follow.objects.filter(author=author).count()
+    if followers > FEED_FANOUT_MAX_FOLLOWERS:
+        FanOutOnReadAuthor.objects.get_or_create(author=author)
+        return
+    with transaction.atomic():
+        mode = (
+            FanOutOnReadAuthor.objects.select_for_update()
+            .filter(author=author)
+            .first()
+        )
+        if mode is None:
+            return
+        mode.delete()
+    # Рецепты, опубликованные в режиме чтения, раскладываются задним
+    # числом; более старые уже лежат в лентах.
+    recipes = list(
+        Recipe.objects.filter(
+            author=author, pub_date__gte=mode.since
+        ).values_list("id", "pub_date")[:FEED_BACKFILL_RECIPES]
+    )
+    if recipes:
+        write_entries(get_follower_ids(author.id), recipes)
+
+
+def get_keyset_filter(before, id_field):
+    if before is None:
+        return Q()
+    pub_date, recipe_id = before
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f"{id_field}__lt": recipe_id}
+    )
+
+
+def get_feed_page(user, limit, before=None, recipes=None):
+    """Ключи (pub_date, id рецепта) ленты по убыванию, не больше limit.
+
+    before — ключ последнего рецепта предыдущей страницы, recipes —
+    QuerySet рецептов, если ленту нужно отфильтровать. Разложенные записи
+    и рецепты авторов с лентой при чтении читаются каждые по своему
+    индексу и сливаются.
+    """
+    entries = FeedEntry.objects.filter(
+        get_keyset_filter(before, "recipe_id"),
+        user=user,
+        recipe__deleted_at__isnull=True,
+    )
+    if recipes is not None:
+        entries = entries.filter(recipe__in=recipes.values("id"))
+    rows = list(
+        entries.order_by("-pub_date", "-recipe_id").values_list(
+            "pub_date", "recipe_id"
+        )[:limit]
+    )
+    read_time_authors = list(
+        Follow.objects.filter(
+            user=user, author__fan_out_on_read__isnull=False
+        ).values_list("author", flat=True)
+    )
+    if not read_time_authors:
+        return rows
+    read_time = (recipes if recipes is not None else Recipe.objects).filter(
+        get_keyset_filter(before, "id"), author_id__in=read_time_authors
+    )
+    rows.extend(
+        read_time.order_by("-pub_date", "-id").values_list("pub_date", "id")[
+            :limit
+        ]
+    )
+    return sorted(set(rows), reverse=True)[:limit]
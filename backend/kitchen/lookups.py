@@ -0,0 +1,142 @@
+"""Горячие чтения через двухуровневый кэш (core/cache.py)."""
+from collections import defaultdict
+
+from core.cache import cached, tiered_cache
+from core.constants import (
+    INGREDIENTS_CACHE_TIMEOUT,
+    RECIPE_FRAGMENT_CACHE_TIMEOUT,
+    SHOPPING_LIST_CACHE_TIMEOUT,
+    SHORT_LINK_CACHE_TIMEOUT,
+)
+from core.response_cache import invalidate_public_responses
+from django.db.models import Sum
+
+from kitchen.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+
+INGREDIENTS_NAMESPACE = "ingredients"
+RECIPE_INGREDIENTS_CACHE = "recipe_ingredients"
+
+
+@cached("ingredients", INGREDIENTS_CACHE_TIMEOUT, INGREDIENTS_NAMESPACE)
+def get_ingredient_rows(name):
+    queryset = Ingredient.objects.all()
+    if name:
+        queryset = queryset.filter(name__istartswith=name)
+    return list(queryset.values("id", "name", "measurement_unit"))
+
+
+def invalidate_ingredients():
+    tiered_cache.bump(INGREDIENTS_NAMESPACE)
+    invalidate_public_responses()
+
+
+@cached("short_link", SHORT_LINK_CACHE_TIMEOUT)
+def get_recipe_id_by_short_link(slug):
+    return (
+        Recipe.objects.filter(short_uuid=slug)
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def get_fragment_key(recipe_id, updated_at):
+    # Время изменения в ключе: правка рецепта сама даёт новый ключ. Правку
+    # названия ингредиента учитывает версия пространства ingredients.
+    return f"{RECIPE_INGREDIENTS_CACHE}:{recipe_id}:{updated_at.timestamp()}"
+
+
+def get_recipe_ingredients(versions):
+    """Списки ингредиентов рецептов {id: updated_at} в формате API."""
+    keys = {
+        recipe_id: get_fragment_key(recipe_id, updated_at)
+        for recipe_id, updated_at in versions.items()
+    }
+    found = tiered_cache.get_many(
+        keys.values(),
+        namespace=INGREDIENTS_NAMESPACE,
+        name=RECIPE_INGREDIENTS_CACHE,
+    )
+    ingredients = defaultdict(list)
+    missing = []
+    for recipe_id, key in keys.items():
+        if key in found:
+            ingredients[recipe_id] = found[key]
+        else:
+            missing.append(recipe_id)
+    if not missing:
+        return ingredients
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=missing
+    ).values_list(
+        "recipe_id",
+        "ingredient_id",
+        "ingredient__name",
+        "ingredient__measurement_unit",
+        "amount",
+    )
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        ingredients[recipe_id].append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "measurement_unit": unit,
+                "amount": amount,
+            }
+        )
+    tiered_cache.set_many(
+        {keys[recipe_id]: ingredients[recipe_id] for recipe_id in missing},
+        RECIPE_FRAGMENT_CACHE_TIMEOUT,
+        namespace=INGREDIENTS_NAMESPACE,
+    )
+    return ingredients
+
+
+def get_cart_namespace(user_id):
+    return f"cart:{user_id}"
+
+
+def get_shopping_list_version(user_id):
+    """Версия списка покупок: меняется при правке корзины, рецептов в ней
+    и справочника ингредиентов. Служит ETag и частью ключа кэша."""
+    cart_version = tiered_cache.get_version(
+        get_cart_namespace(user_id), use_local=False
+    )
+    ingredients_version = tiered_cache.get_version(INGREDIENTS_NAMESPACE)
+    return f"{cart_version}-{ingredients_version}"
+
+
+def invalidate_carts(user_ids):
+    for user_id in user_ids:
+        tiered_cache.bump(get_cart_namespace(user_id))
+
+
+def build_shopping_list(user_id):
+    ingredients = (
+        RecipeIngredient.objects.filter(
+            recipe__in_shopping_carts__user_id=user_id,
+            recipe__deleted_at__isnull=True,
+        )
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total=Sum("amount"))
+        .order_by("ingredient__name")
+    )
+    lines = [
+        f"{item['ingredient__name']} ({item['ingredient__measurement_unit']}) — {item['total']}"
+        for item in ingredients
+    ]
+    return "\n".join(lines)
+
+
+def get_shopping_list(user_id, version):
+    return tiered_cache.get_or_set(
+        f"shopping_list:{user_id}:{version}:txt",
+        lambda: build_shopping_list(user_id),
+        SHOPPING_LIST_CACHE_TIMEOUT,
+        name="shopping_list",
+    )
+
+
+def get_cart_user_ids(recipe_id):
+    return ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        "user_id", flat=True
+    )
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_created(apps, schema_editor):
+    # Настоящее время добавления неизвестно. Дата публикации рецепта не
+    # позже него и, в отличие от времени миграции, не делает все старые
+    # записи «свежими» для рейтинга трендов.
+    Recipe = apps.get_model('kitchen', 'Recipe')
+    for model_name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('kitchen', model_name).objects.update(
+            created=models.Subquery(
+                Recipe.objects.filter(id=models.OuterRef('recipe_id')).values(
+                    'pub_date'
+                )[:1]
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0004_recipe_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='kitchen.recipe', verbose_name='Рецепт')),
+                ('popularity', models.PositiveIntegerField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Рейтинг трендов')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(null=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(null=True, verbose_name='Дата добавления'),
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['created'], name='favorite_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['created'], name='shopping_cart_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popularity'], name='recipe_score_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending'], name='recipe_score_trending_idx'),
+        ),
+    ]
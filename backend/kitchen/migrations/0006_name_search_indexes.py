@@ -0,0 +1,35 @@
+from django.db import migrations
+
+SEARCH_INDEXES = {
+    'recipe_name_lower_idx': 'kitchen_recipe',
+    'ingredient_name_lower_idx': 'kitchen_ingredient',
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    # Префиксный поиск в админке: LOWER(name) LIKE 'префикс%'.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, table in SEARCH_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} '
+            f'ON {table} (LOWER(name) text_pattern_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0005_recipe_rankings'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0006_name_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Список покупок'), ('follow', 'Подписка')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалён')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Изменения',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='change_user_id_idx')],
+            },
+        ),
+    ]
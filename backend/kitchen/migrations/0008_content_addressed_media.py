@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:58
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=core.storage.ContentAddressedStorage(), upload_to='recipes/images/', verbose_name='Картинка'),
+        ),
+    ]
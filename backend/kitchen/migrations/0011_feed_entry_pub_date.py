@@ -0,0 +1,73 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Совпадает с core.constants.FEED_FANOUT_MAX_FOLLOWERS на момент миграции.
+FEED_FANOUT_MAX_FOLLOWERS = 5_000
+
+
+def fill_pub_date(apps, schema_editor):
+    FeedEntry = apps.get_model('kitchen', 'FeedEntry')
+    Recipe = apps.get_model('kitchen', 'Recipe')
+    FeedEntry.objects.update(
+        pub_date=models.Subquery(
+            Recipe.objects.filter(id=models.OuterRef('recipe_id')).values(
+                'pub_date'
+            )[:1]
+        )
+    )
+
+
+def fill_fan_out_on_read(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    FanOutOnReadAuthor = apps.get_model('kitchen', 'FanOutOnReadAuthor')
+    authors = (
+        Follow.objects.values('author')
+        .annotate(followers=models.Count('pk'))
+        .filter(followers__gt=FEED_FANOUT_MAX_FOLLOWERS)
+        .values_list('author', flat=True)
+    )
+    FanOutOnReadAuthor.objects.bulk_create(
+        [FanOutOnReadAuthor(author_id=author_id) for author_id in authors]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0010_model_options_and_validators'),
+        ('users', '0005_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_entry_user_pub_date_idx'),
+        ),
+        migrations.CreateModel(
+            name='FanOutOnReadAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fan_out_on_read', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('since', models.DateTimeField(auto_now_add=True, verbose_name='Лента при чтении с')),
+            ],
+            options={
+                'verbose_name': 'Автор с лентой при чтении',
+                'verbose_name_plural': 'Авторы с лентой при чтении',
+            },
+        ),
+        migrations.RunPython(fill_fan_out_on_read, migrations.RunPython.noop),
+    ]
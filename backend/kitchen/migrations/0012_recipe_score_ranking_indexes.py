@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+def fill_scores(apps, schema_editor):
+    Recipe = apps.get_model('kitchen', 'Recipe')
+    RecipeScore = apps.get_model('kitchen', 'RecipeScore')
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                score__isnull=True
+            ).values_list('id', flat=True).iterator(chunk_size=5_000)
+        ),
+        batch_size=5_000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0011_feed_entry_pub_date'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipescore',
+            name='recipe_score_popularity_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipescore',
+            name='recipe_score_trending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popularity', '-recipe'], name='recipe_score_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from core.constants import MAX_COOKING_TIME, MIN_COOKING_TIME, MAX_INGREDIENT_AMOUNT, MIN_INGREDIENT_AMOUNT
+from core.storage import content_storage
 import uuid
 
 
@@ -25,6 +26,13 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class RecipeManager(models.Manager):
+    """Скрывает рецепты, помеченные на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -34,7 +42,10 @@ class Recipe(models.Model):
     )
     name = models.CharField(max_length=256, verbose_name="Название рецепта")
     image = models.ImageField(
-        upload_to="recipes/images/", verbose_name="Картинка"
+        upload_to="recipes/images/",
+        storage=content_storage,
+        db_index=True,
+        verbose_name="Картинка",
     )
     text = models.TextField(verbose_name="Описание")
     cooking_time = models.PositiveSmallIntegerField(
@@ -59,12 +70,36 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата публикации"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Дата изменения"
+    )
     short_uuid = models.CharField(max_length=8, unique=True, editable=False)
+    deleted_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Дата удаления"
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_pub_date_idx",
+            ),
+            models.Index(fields=["-pub_date"], name="recipe_pub_date_idx"),
+            models.Index(
+                fields=["cooking_time"], name="recipe_cooking_time_idx"
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                name="recipe_deleted_at_idx",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -106,6 +141,12 @@ class RecipeIngredient(models.Model):
                 name="unique_recipe_ingredient",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["ingredient", "recipe"],
+                name="ingredient_recipe_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.ingredient.name} — {self.amount}"
@@ -124,6 +165,9 @@ class Favorite(models.Model):
         related_name="favorited_by",
         verbose_name="Рецепт",
     )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата добавления"
+    )
 
     class Meta:
         verbose_name = "Избранное"
@@ -134,6 +178,9 @@ class Favorite(models.Model):
                 fields=["user", "recipe"], name="unique_favorite"
             )
         ]
+        indexes = [
+            models.Index(fields=["created"], name="favorite_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.recipe}"
@@ -152,6 +199,9 @@ class ShoppingCart(models.Model):
         related_name="in_shopping_carts",
         verbose_name="Рецепт",
     )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата добавления"
+    )
 
     class Meta:
         verbose_name = "Список покупок"
@@ -162,6 +212,159 @@ class ShoppingCart(models.Model):
                 fields=["user", "recipe"], name="unique_shopping_cart"
             )
         ]
+        indexes = [
+            models.Index(fields=["created"], name="shopping_cart_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.recipe}"
+
+
+class RecipeScore(models.Model):
+    """Рейтинги рецепта, пересчитываемые командой refresh_recipe_scores.
+
+    Строка есть у каждого рецепта, так что сортировка по рейтингу
+    соединяет таблицы внутренним JOIN и идёт по индексу
+    (рейтинг, рецепт) с остановкой на LIMIT.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="score",
+        verbose_name="Рецепт",
+    )
+    popularity = models.PositiveIntegerField(
+        default=0, verbose_name="Популярность"
+    )
+    trending = models.FloatField(default=0, verbose_name="Рейтинг трендов")
+    updated = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+        indexes = [
+            models.Index(
+                fields=["-popularity", "-recipe"],
+                name="recipe_score_popularity_idx",
+            ),
+            models.Index(
+                fields=["-trending", "-recipe"],
+                name="recipe_score_trending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe}: {self.popularity} / {self.trending:.2f}"
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Подписчик",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Рецепт",
+    )
+    # Копия Recipe.pub_date: страница ленты читается по индексу
+    # (user, -pub_date, -recipe) без JOIN и сортировки всей ленты.
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_feed_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_entry_user_pub_date_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.recipe}"
+
+
+class FanOutOnReadAuthor(models.Model):
+    """Автор, чьи рецепты подмешиваются в ленты при чтении.
+
+    since — с какого момента рецепты автора не раскладываются по лентам
+    подписчиков; при выходе из этого режима рецепты за этот период
+    раскладываются задним числом.
+    """
+
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="fan_out_on_read",
+        verbose_name="Автор",
+    )
+    since = models.DateTimeField(
+        auto_now_add=True, verbose_name="Лента при чтении с"
+    )
+
+    class Meta:
+        verbose_name = "Автор с лентой при чтении"
+        verbose_name_plural = "Авторы с лентой при чтении"
+
+    def __str__(self):
+        return str(self.author)
+
+
+class Change(models.Model):
+    """Запись журнала изменений для инкрементальной синхронизации.
+
+    id служит токеном синхронизации. Изменения рецептов видны всем
+    (user пустой), избранное, корзина и подписки — только владельцу.
+    """
+
+    RECIPE = "recipe"
+    FAVORITE = "favorite"
+    SHOPPING_CART = "shopping_cart"
+    FOLLOW = "follow"
+    KIND_CHOICES = [
+        (RECIPE, "Рецепт"),
+        (FAVORITE, "Избранное"),
+        (SHOPPING_CART, "Список покупок"),
+        (FOLLOW, "Подписка"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="changes",
+        verbose_name="Пользователь",
+    )
+    kind = models.CharField(
+        max_length=16, choices=KIND_CHOICES, verbose_name="Тип"
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    deleted = models.BooleanField(default=False, verbose_name="Удалён")
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата изменения"
+    )
+
+    class Meta:
+        verbose_name = "Изменение"
+        verbose_name_plural = "Изменения"
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["user", "id"], name="change_user_id_idx"),
+        ]
+
+    def __str__(self):
+        action = "удалён" if self.deleted else "изменён"
+        return f"{self.get_kind_display()} {self.object_id} {action}"
@@ -0,0 +1,82 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.constants import TRENDING_HALF_LIFE_HOURS, TRENDING_WINDOW_DAYS
+from core.response_cache import invalidate_public_responses
+from kitchen.models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+BATCH_SIZE = 5_000
+
+
+def count_popularity():
+    popularity = Counter()
+    for model in (Favorite, ShoppingCart):
+        rows = (
+            model.objects.values("recipe")
+            .annotate(total=Count("id"))
+            .values_list("recipe", "total")
+            .order_by()
+        )
+        for recipe_id, total in rows.iterator(chunk_size=BATCH_SIZE):
+            popularity[recipe_id] += total
+    return popularity
+
+
+def count_trending(now):
+    trending = Counter()
+    half_life = timedelta(hours=TRENDING_HALF_LIFE_HOURS).total_seconds()
+    since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    for model in (Favorite, ShoppingCart):
+        events = model.objects.filter(created__gte=since).values_list(
+            "recipe", "created"
+        ).order_by()
+        for recipe_id, created in events.iterator(chunk_size=BATCH_SIZE):
+            age = (now - created).total_seconds()
+            trending[recipe_id] += 0.5 ** (age / half_life)
+    return trending
+
+
+def refresh_scores():
+    """Пересчитывает таблицу рейтингов; возвращает число рецептов в ней."""
+    now = timezone.now()
+    popularity = count_popularity()
+    trending = count_trending(now)
+    scores = [
+        RecipeScore(
+            recipe_id=recipe_id,
+            popularity=popularity[recipe_id],
+            trending=trending[recipe_id],
+        )
+        for recipe_id in popularity.keys() | trending.keys()
+    ]
+    with transaction.atomic():
+        RecipeScore.objects.bulk_create(
+            scores,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["recipe"],
+            update_fields=["popularity", "trending", "updated"],
+        )
+        # Рецепты, которых не оказалось в пересчёте, рейтинг потеряли, но
+        # строка остаётся: сортировка соединяет таблицы внутренним JOIN.
+        RecipeScore.objects.filter(updated__lt=now).update(
+            popularity=0, trending=0, updated=now
+        )
+        missing = Recipe.all_objects.filter(score__isnull=True).values_list(
+            "id", flat=True
+        )
+        RecipeScore.objects.bulk_create(
+            (
+                RecipeScore(recipe_id=recipe_id)
+                for recipe_id in missing.iterator(chunk_size=BATCH_SIZE)
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    # Порядок ?ordering=popular|trending в кэшированных ответах устарел.
+    invalidate_public_responses()
+    return len(scores)
@@ -0,0 +1,147 @@
+import heapq
+from collections import Counter, defaultdict
+
+from core.constants import SIMILAR_RECIPES_CACHE_SIZE
+from core.indexes import InMemoryIndex
+from kitchen.models import RecipeIngredient
+
+BUILD_CHUNK_SIZE = 10_000
+
+
+class RecipeIngredientIndex(InMemoryIndex):
+    """Разреженная матрица рецепт × ингредиент.
+
+    Хранится по строкам (рецепт -> множество ингредиентов) и по столбцам
+    (ингредиент -> множество рецептов), так что перекрытие рецепта со
+    всеми остальными считается обходом нескольких столбцов, без SQL.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.recipe_ingredients = {}
+        self.postings = defaultdict(set)
+        self.similar_cache = {}
+
+    def build(self):
+        rows = defaultdict(set)
+        pairs = (
+            RecipeIngredient.objects.filter(recipe__deleted_at__isnull=True)
+            .values_list("recipe_id", "ingredient_id")
+            .order_by()
+        )
+        for recipe_id, ingredient_id in pairs.iterator(
+            chunk_size=BUILD_CHUNK_SIZE
+        ):
+            rows[recipe_id].add(ingredient_id)
+        return self.index_rows(rows)
+
+    @staticmethod
+    def index_rows(rows):
+        recipe_ingredients = {}
+        postings = defaultdict(set)
+        for recipe_id, ingredient_ids in rows.items():
+            ingredient_ids = frozenset(ingredient_ids)
+            recipe_ingredients[recipe_id] = ingredient_ids
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].add(recipe_id)
+        return recipe_ingredients, postings
+
+    def install(self, state):
+        self.recipe_ingredients, self.postings = state
+        self.similar_cache = {}
+
+    def load(self, rows):
+        self.install(self.index_rows(rows))
+
+    def _add(self, recipe_id, ingredient_ids):
+        ingredient_ids = frozenset(ingredient_ids)
+        self.recipe_ingredients[recipe_id] = ingredient_ids
+        for ingredient_id in ingredient_ids:
+            self.postings[ingredient_id].add(recipe_id)
+
+    def _remove(self, recipe_id):
+        ingredient_ids = self.recipe_ingredients.pop(recipe_id, frozenset())
+        for ingredient_id in ingredient_ids:
+            recipes = self.postings.get(ingredient_id)
+            if recipes is not None:
+                recipes.discard(recipe_id)
+                if not recipes:
+                    del self.postings[ingredient_id]
+        return ingredient_ids
+
+    def _invalidate_similar(self, recipe_id, ingredient_ids):
+        self.similar_cache.pop(recipe_id, None)
+        for ingredient_id in ingredient_ids:
+            for other_id in self.postings.get(ingredient_id, ()):
+                self.similar_cache.pop(other_id, None)
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        with self.lock:
+            if not self.is_built:
+                return
+            self.record(self.update_recipe, recipe_id, ingredient_ids)
+            old_ids = self._remove(recipe_id)
+            self._add(recipe_id, ingredient_ids)
+            self._invalidate_similar(recipe_id, old_ids | set(ingredient_ids))
+
+    def remove_recipe(self, recipe_id):
+        with self.lock:
+            if not self.is_built:
+                return
+            self.record(self.remove_recipe, recipe_id)
+            self._invalidate_similar(recipe_id, self._remove(recipe_id))
+
+    def _rank_similar(self, recipe_id):
+        ingredient_ids = self.recipe_ingredients.get(recipe_id)
+        if not ingredient_ids:
+            return []
+        overlaps = Counter()
+        for ingredient_id in ingredient_ids:
+            overlaps.update(self.postings[ingredient_id])
+        del overlaps[recipe_id]
+        size = len(ingredient_ids)
+        scored = (
+            (
+                overlap
+                / (size + len(self.recipe_ingredients[other_id]) - overlap),
+                other_id,
+            )
+            for other_id, overlap in overlaps.items()
+        )
+        return [
+            (other_id, score)
+            for score, other_id in heapq.nlargest(
+                SIMILAR_RECIPES_CACHE_SIZE, scored
+            )
+        ]
+
+    def similar(self, recipe_id, limit):
+        """Рецепты с наибольшим коэффициентом Жаккара по ингредиентам."""
+        self.ensure_fresh()
+        with self.lock:
+            ranked = self.similar_cache.get(recipe_id)
+            if ranked is None:
+                ranked = self._rank_similar(recipe_id)
+                self.similar_cache[recipe_id] = ranked
+        return ranked[:limit]
+
+    def find_cookable(self, ingredient_ids, max_missing):
+        """Рецепты, для которых не хватает не более max_missing ингредиентов.
+
+        Возвращает пары (рецепт, число недостающих), сначала самые полные.
+        """
+        self.ensure_fresh()
+        with self.lock:
+            matched = Counter()
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self.postings.get(ingredient_id, ()))
+            found = []
+            for recipe_id, count in matched.items():
+                missing = len(self.recipe_ingredients[recipe_id]) - count
+                if missing <= max_missing:
+                    found.append((missing, -recipe_id))
+        found.sort()
+        return [(-negative_id, missing) for missing, negative_id in found]
+
+
+recipe_index = RecipeIngredientIndex()
@@ -0,0 +1,230 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from core.cache import tiered_cache
+from core.events import publish_event
+from core.response_cache import invalidate_public_responses
+from core.storage import track_file_field
+from kitchen.feed import backfill_feed, prune_feed
+from kitchen.lookups import (
+    get_cart_user_ids,
+    get_fragment_key,
+    get_recipe_id_by_short_link,
+    invalidate_carts,
+    invalidate_ingredients,
+)
+from kitchen.models import (
+    Change,
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+)
+from kitchen.search import recipe_index
+from kitchen.suggestions import follow_graph
+from kitchen.sync import record_change, record_changes
+from users.models import Follow, User
+
+track_file_field(Recipe, "image")
+
+# Отправляется после того, как рецепт и его ингредиенты сохранены:
+# post_save для Recipe приходит раньше, чем записаны ингредиенты.
+recipe_saved = Signal()
+
+# Отправляется после мягкого удаления рецептов (kitchen/deletion.py):
+# строки остаются в базе до purge_deleted, и post_delete не приходит.
+recipes_hidden = Signal()
+
+
+@receiver(recipe_saved)
+def update_recipe_index(sender, recipe, ingredient_ids, **kwargs):
+    recipe_index.update_recipe(recipe.id, ingredient_ids)
+
+
+@receiver(recipe_saved)
+def drop_recipe_fragment(sender, recipe, **kwargs):
+    # Читатель мог закэшировать старые ингредиенты под новым updated_at,
+    # пока они перезаписывались.
+    tiered_cache.delete(get_fragment_key(recipe.id, recipe.updated_at))
+
+
+@receiver(recipe_saved)
+def drop_shopping_lists(sender, recipe, **kwargs):
+    invalidate_carts(get_cart_user_ids(recipe.id))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def drop_shopping_list(sender, instance, **kwargs):
+    invalidate_carts([instance.user_id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def drop_short_link(sender, instance, created=True, **kwargs):
+    # Короткая ссылка могла принадлежать удалённому рецепту.
+    if created:
+        get_recipe_id_by_short_link.invalidate(instance.short_uuid)
+
+
+@receiver(recipe_saved)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def drop_public_responses(sender, **kwargs):
+    # recipe_saved приходит после записи ингредиентов: ответ, собранный
+    # между post_save и их записью, не останется в кэше.
+    invalidate_public_responses()
+
+
+@receiver(post_save, sender=User)
+def drop_public_responses_for_author(sender, update_fields=None, **kwargs):
+    # Автор с именем и аватаром выводится в рецептах; вход в систему
+    # обновляет только last_login.
+    if update_fields != frozenset({"last_login"}):
+        invalidate_public_responses()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def drop_ingredients(sender, **kwargs):
+    invalidate_ingredients()
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_index(sender, instance, **kwargs):
+    recipe_index.remove_recipe(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, raw=False, **kwargs):
+    # Без строки рейтинга рецепт не попал бы в сортировку по рейтингу.
+    if created and not raw:
+        RecipeScore.objects.get_or_create(recipe=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(Change.RECIPE, instance.id)
+    if created:
+        publish_event(
+            Change.RECIPE,
+            {"id": instance.id, "author": instance.author_id},
+            author=instance.author_id,
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_deleted(sender, instance, **kwargs):
+    record_change(Change.RECIPE, instance.id, deleted=True)
+
+
+@receiver(recipes_hidden)
+def drop_hidden_recipes(sender, recipe_ids, short_links, **kwargs):
+    for recipe_id in recipe_ids:
+        recipe_index.remove_recipe(recipe_id)
+    for short_link in short_links:
+        get_recipe_id_by_short_link.invalidate(short_link)
+    invalidate_carts(
+        ShoppingCart.objects.filter(recipe_id__in=recipe_ids)
+        .values_list("user_id", flat=True)
+        .order_by()
+        .distinct()
+    )
+    invalidate_public_responses()
+    record_changes(Change.RECIPE, recipe_ids, deleted=True)
+
+
+USER_CHANGE_KINDS = {
+    Favorite: (Change.FAVORITE, "recipe_id"),
+    ShoppingCart: (Change.SHOPPING_CART, "recipe_id"),
+    Follow: (Change.FOLLOW, "author_id"),
+}
+
+
+def log_user_change(sender, instance, deleted):
+    kind, field = USER_CHANGE_KINDS[sender]
+    object_id = getattr(instance, field)
+    record_change(kind, object_id, user_id=instance.user_id, deleted=deleted)
+    # Другие устройства пользователя узнают об изменении через SSE.
+    publish_event(
+        kind,
+        {"id": object_id, "deleted": deleted},
+        users=[instance.user_id],
+    )
+
+
+def log_user_change_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        log_user_change(sender, instance, deleted=False)
+
+
+def is_owner_deleted(instance, origin):
+    # При удалении самого пользователя его журнал удаляется каскадом,
+    # и новая запись сослалась бы на удаляемую строку.
+    if isinstance(origin, User):
+        return origin.pk == instance.user_id
+    return getattr(origin, "model", None) is User
+
+
+def log_user_change_deleted(sender, instance, origin=None, **kwargs):
+    if not is_owner_deleted(instance, origin):
+        log_user_change(sender, instance, deleted=True)
+
+
+for model in USER_CHANGE_KINDS:
+    post_save.connect(log_user_change_saved, sender=model)
+    post_delete.connect(log_user_change_deleted, sender=model)
+
+
+# Лента ведётся на уровне модели, чтобы подписки из API и из админки
+# обновляли её одинаково.
+@receiver(post_save, sender=Follow)
+def backfill_feed_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill_feed(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed_on_unfollow(sender, instance, origin=None, **kwargs):
+    # При удалении пользователя его записи ленты уходят каскадом.
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    prune_feed(instance.user, instance.author)
+
+
+# Граф меняется только после фиксации: откаченная подписка не должна
+# попасть в рекомендации.
+@receiver(post_save, sender=Follow)
+def add_to_follow_graph(sender, instance, created, **kwargs):
+    if created:
+        user_id, author_id = instance.user_id, instance.author_id
+        transaction.on_commit(lambda: follow_graph.follow(user_id, author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def remove_from_follow_graph(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(
+        lambda: follow_graph.follow(user_id, author_id, followed=False)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def add_favorite_to_graph(sender, instance, created, **kwargs):
+    if created:
+        user_id, recipe_id = instance.user_id, instance.recipe_id
+        transaction.on_commit(
+            lambda: follow_graph.favorite(user_id, recipe_id)
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def remove_favorite_from_graph(sender, instance, **kwargs):
+    user_id, recipe_id = instance.user_id, instance.recipe_id
+    transaction.on_commit(
+        lambda: follow_graph.favorite(user_id, recipe_id, added=False)
+    )
@@ -0,0 +1,287 @@
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from core.constants import (
+    SUGGESTIONS_CACHE_SIZE,
+    SUGGESTIONS_CANDIDATES,
+    SUGGESTIONS_CATCH_UP_SECONDS,
+    SUGGESTIONS_DELTA_LIMIT,
+    SUGGESTIONS_MAX_FRIENDS,
+)
+from core.indexes import InMemoryIndex
+from kitchen.models import Change, Favorite
+from kitchen.sync import (
+    get_current_token,
+    get_settled_before,
+    is_token_expired,
+)
+from users.models import Follow
+
+BUILD_CHUNK_SIZE = 10_000
+CATCH_UP_LIMIT = 10_000
+
+
+class Adjacency:
+    """Списки смежности в формате CSR с накладкой изменений.
+
+    Соседи вершины с номером i лежат в values[offsets[i]:offsets[i + 1]],
+    номера выдаёт positions. Массивы array занимают по 8 байт на ребро
+    вместо сотни на множество Python. Массивы после построения не
+    меняются, изменения копятся в added/removed; compacted() собирает из
+    всего этого новую структуру.
+    """
+
+    def __init__(self, pairs=()):
+        self.positions = {}
+        self.offsets = array("q", [0])
+        self.values = array("q")
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+        self.delta_size = 0
+        # Пары должны идти по возрастанию источника.
+        for source, target in pairs:
+            if source not in self.positions:
+                if self.positions:
+                    self.offsets.append(len(self.values))
+                self.positions[source] = len(self.positions)
+            self.values.append(target)
+        if self.positions:
+            self.offsets.append(len(self.values))
+
+    def stored(self, source):
+        position = self.positions.get(source)
+        if position is None:
+            return self.values[:0]
+        return self.values[self.offsets[position]:self.offsets[position + 1]]
+
+    def get(self, source):
+        """Соседи вершины: срез массива или множество, если есть накладка."""
+        stored = self.stored(source)
+        if source not in self.added and source not in self.removed:
+            return stored
+        return (
+            set(stored) - self.removed.get(source, set())
+        ) | self.added.get(source, set())
+
+    def add(self, source, target):
+        self.removed[source].discard(target)
+        self.added[source].add(target)
+        self.delta_size += 1
+
+    def remove(self, source, target):
+        self.added[source].discard(target)
+        self.removed[source].add(target)
+        self.delta_size += 1
+
+    def snapshot(self):
+        """Копия накладки над теми же массивами, для compacted() в потоке."""
+        copy = Adjacency()
+        copy.positions = self.positions
+        copy.offsets = self.offsets
+        copy.values = self.values
+        for source, targets in self.added.items():
+            copy.added[source] = set(targets)
+        for source, targets in self.removed.items():
+            copy.removed[source] = set(targets)
+        return copy
+
+    def compacted(self):
+        sources = sorted(
+            set(self.positions) | set(self.added) | set(self.removed)
+        )
+        return Adjacency(
+            (source, target)
+            for source in sources
+            for target in sorted(self.get(source))
+        )
+
+
+class FollowGraphIndex(InMemoryIndex):
+    """Граф подписок и избранного для рекомендаций авторов.
+
+    Кандидаты — авторы, на которых подписаны те, на кого подписан
+    пользователь (друзья друзей). Число таких путей умножается на
+    1 + число рецептов, которые пользователь и кандидат оба добавили в
+    избранное. Подписки и избранное этого процесса применяются после
+    фиксации транзакции, чужие — из журнала изменений (kitchen.sync) не
+    реже раза в SUGGESTIONS_CATCH_UP_SECONDS. Накладка изменений
+    вливается в массивы в фоновом потоке, полностью граф перестраивается
+    раз в ttl.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.following = Adjacency()
+        self.favorites = Adjacency()
+        self.popular = []
+        self.token = 0
+        self.cache = {}
+        # Пользователь -> чьи кэшированные рекомендации от него зависят.
+        self.dependents = defaultdict(set)
+        self.caught_up_at = 0
+        self.catch_up_lock = threading.Lock()
+
+    def build(self):
+        # Токен берётся до чтения графа и только по устоявшимся записям:
+        # всё, что зафиксируется позже, catch_up() применит поверх.
+        token = get_current_token()
+        follows = (
+            Follow.objects.filter(
+                user__deleted_at__isnull=True,
+                author__deleted_at__isnull=True,
+            )
+            .values_list("user_id", "author_id")
+            .order_by("user_id", "author_id")
+        )
+        favorites = (
+            Favorite.objects.filter(
+                user__deleted_at__isnull=True,
+                recipe__deleted_at__isnull=True,
+            )
+            .values_list("user_id", "recipe_id")
+            .order_by("user_id", "recipe_id")
+        )
+        following = Adjacency(follows.iterator(chunk_size=BUILD_CHUNK_SIZE))
+        popular = [
+            author_id
+            for author_id, _ in Counter(following.values).most_common(
+                SUGGESTIONS_CACHE_SIZE
+            )
+        ]
+        return (
+            following,
+            Adjacency(favorites.iterator(chunk_size=BUILD_CHUNK_SIZE)),
+            popular,
+            token,
+        )
+
+    def install(self, state):
+        self.following, self.favorites, self.popular, self.token = state
+        self.cache = {}
+        self.dependents = defaultdict(set)
+
+    def compact(self, following, favorites, popular, token):
+        return following.compacted(), favorites.compacted(), popular, token
+
+    def _changed(self, user_id):
+        # Вызывается под self.lock после изменения подписок или избранного.
+        self.cache.pop(user_id, None)
+        for dependent_id in self.dependents.pop(user_id, ()):
+            self.cache.pop(dependent_id, None)
+        if (
+            self.following.delta_size + self.favorites.delta_size
+            > SUGGESTIONS_DELTA_LIMIT
+        ):
+            state = (
+                self.following.snapshot(),
+                self.favorites.snapshot(),
+                self.popular,
+                self.token,
+            )
+            self.start_rebuild(lambda: self.compact(*state))
+
+    def follow(self, user_id, author_id, followed=True):
+        with self.lock:
+            if not self.is_built:
+                return
+            self.record(self.follow, user_id, author_id, followed)
+            if followed:
+                self.following.add(user_id, author_id)
+            else:
+                self.following.remove(user_id, author_id)
+            self._changed(user_id)
+
+    def favorite(self, user_id, recipe_id, added=True):
+        with self.lock:
+            if not self.is_built:
+                return
+            self.record(self.favorite, user_id, recipe_id, added)
+            if added:
+                self.favorites.add(user_id, recipe_id)
+            else:
+                self.favorites.remove(user_id, recipe_id)
+            self._changed(user_id)
+
+    def catch_up(self):
+        """Применяет подписки и избранное из журнала изменений."""
+        now = time.monotonic()
+        if now - self.caught_up_at < SUGGESTIONS_CATCH_UP_SECONDS:
+            return
+        if not self.catch_up_lock.acquire(blocking=False):
+            return
+        try:
+            self.caught_up_at = now
+            token = self.token
+            if is_token_expired(token):
+                self.expire()
+                return
+            rows = list(
+                Change.objects.filter(
+                    id__gt=token,
+                    kind__in=(Change.FOLLOW, Change.FAVORITE),
+                    created__lte=get_settled_before(),
+                )
+                .order_by("id")
+                .values_list("id", "kind", "user_id", "object_id", "deleted")[
+                    :CATCH_UP_LIMIT
+                ]
+            )
+            if not rows:
+                return
+            with self.lock:
+                for _, kind, user_id, object_id, deleted in rows:
+                    if kind == Change.FOLLOW:
+                        self.follow(user_id, object_id, not deleted)
+                    else:
+                        self.favorite(user_id, object_id, not deleted)
+                self.token = max(self.token, rows[-1][0])
+        finally:
+            self.catch_up_lock.release()
+
+    def _rank(self, user_id):
+        following = self.following.get(user_id)
+        excluded = set(following)
+        excluded.add(user_id)
+        # При тысячах подписок пути считаются по равномерной выборке
+        # друзей: ранжирование почти не меняется, а время ограничено.
+        friends = sorted(following)
+        step = max(1, -(-len(friends) // SUGGESTIONS_MAX_FRIENDS))
+        paths = Counter()
+        for friend_id in friends[::step]:
+            self.dependents[friend_id].add(user_id)
+            paths.update(self.following.get(friend_id))
+        for author_id in excluded:
+            paths.pop(author_id, None)
+        if not paths:
+            return [
+                author_id
+                for author_id in self.popular
+                if author_id not in excluded
+            ]
+        own_favorites = set(self.favorites.get(user_id))
+        scored = []
+        for author_id, count in paths.most_common(SUGGESTIONS_CANDIDATES):
+            self.dependents[author_id].add(user_id)
+            shared = (
+                len(own_favorites.intersection(self.favorites.get(author_id)))
+                if own_favorites
+                else 0
+            )
+            scored.append((-count * (1 + shared), author_id))
+        scored.sort()
+        return [author_id for _, author_id in scored[:SUGGESTIONS_CACHE_SIZE]]
+
+    def suggest(self, user_id, limit):
+        """id авторов, на которых стоит подписаться, лучшие первыми."""
+        self.ensure_fresh()
+        self.catch_up()
+        with self.lock:
+            ranked = self.cache.get(user_id)
+            if ranked is None:
+                ranked = self._rank(user_id)
+                self.cache[user_id] = ranked
+        return ranked[:limit]
+
+
+follow_graph = FollowGraphIndex()
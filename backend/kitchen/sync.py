@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.constants import PURGE_BATCH_SIZE, SYNC_MAX_CHANGES
+from core.purge import iter_pk_batches
+from kitchen.models import Change
+
+
+def record_change(kind, object_id, user_id=None, deleted=False):
+    Change.objects.create(
+        kind=kind, object_id=object_id, user_id=user_id, deleted=deleted
+    )
+
+
+def record_changes(kind, object_ids, deleted=False):
+    Change.objects.bulk_create(
+        [
+            Change(kind=kind, object_id=object_id, deleted=deleted)
+            for object_id in object_ids
+        ],
+        batch_size=SYNC_MAX_CHANGES,
+    )
+
+
+def get_settled_before():
+    """Записи, созданные раньше этого момента, уже не пополнятся.
+
+    id выдаются при вставке, а транзакции фиксируются не по порядку:
+    запись с меньшим id может стать видна позже записи с большим.
+    """
+    return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def get_current_token():
+    """Токен последнего устоявшегося изменения, см. get_settled_before()."""
+    last = (
+        Change.objects.filter(created__lte=get_settled_before())
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return last or 0
+
+
+def is_token_expired(since):
+    """Удалены ли из журнала изменения, идущие после токена since.
+
+    Журнал чистится с начала, поэтому токен устарел, если до первой
+    оставшейся записи он не дотягивается.
+    """
+    first = Change.objects.order_by("id").values_list("id", flat=True).first()
+    return first is not None and since < first - 1
+
+
+def prune_changes(batch_size=PURGE_BATCH_SIZE):
+    """Удаляет записи журнала старше SYNC_RETENTION_DAYS дней."""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS)
+    # Граница по id, а не по дате, и последняя запись остаётся всегда:
+    # по первой оставшейся записи is_token_expired узнаёт, что удалено.
+    first_kept = (
+        Change.objects.filter(created__gte=cutoff)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    ) or Change.objects.order_by("-id").values_list("id", flat=True).first()
+    expired = Change.objects.filter(id__lt=first_kept)
+    deleted = 0
+    for pks in iter_pk_batches(expired, batch_size):
+        deleted += Change.objects.filter(pk__in=pks)._raw_delete(
+            Change.objects.db
+        )
+    return deleted
+
+
+def get_changes(user, since, limit=SYNC_MAX_CHANGES):
+    """Изменения после токена since, видимые пользователю.
+
+    Возвращает (изменения, новый токен, есть ли ещё). Для каждого объекта
+    остаётся только последнее изменение. Записи моложе
+    SYNC_SETTLE_SECONDS не отдаются, иначе клиент мог бы перескочить
+    через изменение с меньшим id (см. get_settled_before()).
+    """
+    settled = get_settled_before()
+    visible = Q(user__isnull=True)
+    if user.is_authenticated:
+        visible |= Q(user=user)
+    rows = list(
+        Change.objects.filter(visible, id__gt=since, created__lte=settled)
+        .order_by("id")
+        .values_list("id", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for change_id, kind, object_id, deleted in rows:
+        latest[kind, object_id] = deleted
+    token = rows[-1][0] if rows else since
+    return latest, token, has_more
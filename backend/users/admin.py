@@ -1,16 +1,30 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from core.admin_utils import CsvExportMixin, LargeTableAdmin, SoftDeleteMixin
+from kitchen.deletion import soft_delete_users
 from users.models import User, Follow
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(
+    SoftDeleteMixin, CsvExportMixin, LargeTableAdmin, BaseUserAdmin
+):
+    soft_delete = staticmethod(soft_delete_users)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff')
+    csv_fields = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'date_joined'
+    )
     search_fields = ('username', 'email')
     ordering = ('username',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(CsvExportMixin, LargeTableAdmin, admin.ModelAdmin):
     list_display = ('user', 'author')
+    csv_fields = ('user__username', 'author__username')
+    list_select_related = ('user', 'author')
     search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:36
+
+from django.db import migrations
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_search_indexes(apps, schema_editor):
+    # text_pattern_ops нужен, чтобы LIKE 'префикс%' использовал индекс при
+    # любой collation базы. Выражения с opclass поддерживает только Postgres.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS user_{field}_lower_idx '
+            f'ON users_user (LOWER({field}) text_pattern_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_lower_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ['author'], 'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:58
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='users/avatars/', verbose_name='Аватар'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from core.storage import content_storage
+
 
 class User(AbstractUser):
     email = models.EmailField(
@@ -8,10 +10,15 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to="users/avatars/",
+        storage=content_storage,
         blank=True,
         null=True,
+        db_index=True,
         verbose_name="Аватар",
     )
+    deleted_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Дата удаления"
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
@@ -19,6 +26,13 @@ class User(AbstractUser):
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ["username"]
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                name="user_deleted_at_idx",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.username
@@ -0,0 +1,4 @@
+from core.storage import track_file_field
+from users.models import User
+
+track_file_field(User, "avatar")
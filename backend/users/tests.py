@@ -1,8 +1,16 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from users.models import User
+from kitchen.models import Change, Favorite, Recipe
+from kitchen.suggestions import follow_graph
+from users.models import Follow, User
 
 
 class FoodgramAPITestCase(TestCase):
@@ -54,3 +62,147 @@ class FoodgramAPITestCase(TestCase):
             reverse("users-subscribe", args=[user2.id])
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_profile_read_does_not_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("users-me"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data["username"], "testuser")
+        self.assertFalse(response.data["is_subscribed"])
+
+        response = self.client.patch(
+            reverse("users-me"), {"first_name": "Новое"}
+        )
+        self.assertEqual(response.data["first_name"], "Новое")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Новое")
+
+    def test_users_list_search_and_subscriptions(self):
+        authors = [
+            User.objects.create_user(
+                username=username,
+                email=f"{username}@example.com",
+                password="testpass123",
+                last_name=last_name,
+            )
+            for username, last_name in (
+                ("anna", "Smith"),
+                ("boris", "Anderson"),
+                ("ivan", "Petrov"),
+            )
+        ]
+        self.client.post(reverse("users-subscribe", args=[authors[0].id]))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("users-list"), {"search": "An"})
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [
+                (item["username"], item["is_subscribed"])
+                for item in response.data["results"]
+            ],
+            [("anna", True), ("boris", False)],
+        )
+
+        response = self.client.get(
+            reverse("users-list"), {"cursor": "", "limit": 2}
+        )
+        self.assertEqual(
+            [item["username"] for item in response.data["results"]],
+            ["anna", "boris"],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [item["username"] for item in response.data["results"]],
+            ["ivan", "testuser"],
+        )
+
+
+class SuggestionsTestCase(TestCase):
+    def setUp(self):
+        self.users = {
+            name: User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="testpass123",
+            )
+            for name in ("me", "friend1", "friend2", "popular", "taste")
+        }
+        for user, author in (
+            ("me", "friend1"),
+            ("me", "friend2"),
+            ("friend1", "popular"),
+            ("friend2", "popular"),
+            ("friend1", "taste"),
+        ):
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author]
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.users["me"])
+        follow_graph.reset()
+
+    def suggested(self):
+        response = self.client.get(reverse("users-suggestions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user["username"] for user in response.data]
+
+    def test_friends_of_friends_weighted_by_shared_favorites(self):
+        self.assertEqual(self.suggested(), ["popular", "taste"])
+
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=self.users["friend1"],
+                name=f"Рецепт {number}",
+                image="recipes/images/test.png",
+                text="Описание",
+                cooking_time=10,
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ("me", "taste"):
+                    Favorite.objects.create(
+                        user=self.users[name], recipe=recipe
+                    )
+        self.assertEqual(self.suggested(), ["taste", "popular"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("users-subscribe", args=[self.users["taste"].id])
+            )
+        self.assertEqual(self.suggested(), ["popular"])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_late_commits_from_other_workers_are_caught_up(self):
+        self.assertEqual(self.suggested(), ["popular", "taste"])
+        self.assertEqual(follow_graph.token, 0)
+        # Подписка из другого процесса: сигналы этого до графа не доходят.
+        with self.captureOnCommitCallbacks():
+            Follow.objects.create(
+                user=self.users["me"], author=self.users["popular"]
+            )
+        Change.objects.update(created=timezone.now() - timedelta(minutes=5))
+        follow_graph.caught_up_at = 0
+        self.assertEqual(self.suggested(), ["taste"])
+
+    def test_user_without_follows_gets_popular_authors(self):
+        self.client.force_authenticate(self.users["taste"])
+        self.assertEqual(self.suggested(), ["popular", "friend1", "friend2"])
+
+    def test_changes_wait_for_commit_and_compact_in_background(self):
+        self.assertEqual(self.suggested(), ["popular", "taste"])
+        with patch("kitchen.suggestions.SUGGESTIONS_DELTA_LIMIT", 0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                Follow.objects.create(
+                    user=self.users["friend2"], author=self.users["taste"]
+                )
+            self.assertEqual(self.suggested(), ["popular", "taste"])
+            for callback in callbacks:
+                callback()
+        follow_graph.rebuild_thread.join(timeout=10)
+        self.assertEqual(follow_graph.following.delta_size, 0)
+        self.assertEqual(
+            list(follow_graph.following.get(self.users["friend2"].id)),
+            sorted([self.users["popular"].id, self.users["taste"].id]),
+        )
+        self.assertEqual(self.suggested(), ["popular", "taste"])